@@ -0,0 +1,48 @@
+"""CPU cost against bytes saved when compressing feed responses.
+
+    poetry run python benchmarks/bench_compression.py
+"""
+import timeit
+import uuid
+from typing import List
+
+from kaizen_blog_api.compression import COMPRESSORS, compress
+from kaizen_blog_api.post.entities import Image, Post
+from kaizen_blog_api.serializers import to_json_many
+
+FEED_SIZES = (1, 10, 50, 100)
+LEVELS = (1, 6, 9)
+ROUNDS = 20
+
+
+def make_posts(count: int) -> List[Post]:
+    posts = []
+    for num in range(count):
+        post_id = uuid.uuid4()
+        posts.append(
+            Post(
+                id=post_id,
+                text=f"Post number {num}. " + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+                username=f"user {num}",
+                likes=num,
+                image=Image(id=post_id, url=f"https://images.s3.amazonaws.com/posts/{post_id}.png"),
+            )
+        )
+    return posts
+
+
+def main() -> None:
+    print(f"{'posts':>5} {'coding':>8} {'level':>5} {'bytes':>8} {'saved':>7} {'us':>9}")
+    for size in FEED_SIZES:
+        body = to_json_many(make_posts(size))
+        print(f"{size:>5} {'identity':>8} {'-':>5} {len(body):>8} {'0%':>7} {0:>9.1f}")
+        for coding in COMPRESSORS:
+            for level in LEVELS:
+                compressed = compress(body, coding, level)
+                best = min(timeit.repeat(lambda: compress(body, coding, level), number=1, repeat=ROUNDS))
+                saved = 1 - len(compressed) / len(body)
+                print(f"{size:>5} {coding:>8} {level:>5} {len(compressed):>8} {saved:>7.0%} {best * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Cost of rendering the image variants: plain resizes against draft/reduce, serially and in a pool.
+
+    poetry run python benchmarks/bench_images.py [image ...]
+
+Without arguments a corpus of synthetic photos and graphics is generated.
+"""
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from typing import Callable, Dict, List, Optional
+
+from PIL import Image as ImageProcess, ImageDraw, ImageFilter
+
+from kaizen_blog_api.post.images import VARIANT_WIDTHS, render_variant, render_variants
+
+ROUNDS = 3
+
+
+def synthetic_photo(width: int, height: int) -> bytes:
+    img = ImageProcess.effect_mandelbrot((width, height), (-2.0, -1.2, 1.0, 1.2), 64).convert("RGB")
+    red, green = img.getchannel(0), img.filter(ImageFilter.GaussianBlur(4)).getchannel(0)
+    img = ImageProcess.merge("RGB", (red, green, red.point(lambda value: 255 - value)))
+    out = BytesIO()
+    img.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def synthetic_graphic(width: int, height: int) -> bytes:
+    img = ImageProcess.new("RGBA", (width, height), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(img)
+    for step in range(0, width, max(1, width // 40)):
+        draw.line((step, 0, width - step, height), fill=(step % 255, 80, 160, 255), width=3)
+    out = BytesIO()
+    img.save(out, "PNG")
+    return out.getvalue()
+
+
+def corpus() -> Dict[str, bytes]:
+    if len(sys.argv) > 1:
+        return {path: open(path, "rb").read() for path in sys.argv[1:]}
+    return {
+        "photo 1024x768 jpeg": synthetic_photo(1024, 768),
+        "photo 3000x2000 jpeg": synthetic_photo(3000, 2000),
+        "photo 4032x3024 jpeg": synthetic_photo(4032, 3024),
+        "graphic 1200x800 png": synthetic_graphic(1200, 800),
+        "graphic 2400x1600 png": synthetic_graphic(2400, 1600),
+    }
+
+
+def naive(data: bytes, executor: Optional[Executor] = None) -> None:
+    """Same outputs, but decoding at full size and resampling from it for every variant"""
+    for width in VARIANT_WIDTHS.values():
+        img = ImageProcess.open(BytesIO(data))
+        own_format = "JPEG" if img.format == "JPEG" else "PNG"
+        img = img.convert("RGB" if own_format == "JPEG" else "RGBA")
+        img = img.resize((width, max(1, img.height * width // img.width)), ImageProcess.LANCZOS)
+        for image_format in (own_format, "WEBP"):
+            img.save(BytesIO(), image_format)
+
+
+def serial(data: bytes, executor: Optional[Executor] = None) -> None:
+    for name, width in VARIANT_WIDTHS.items():
+        render_variant(data, name, width)
+
+
+def pooled(data: bytes, executor: Optional[Executor] = None) -> None:
+    render_variants(data, executor)
+
+
+def best_of(fn: Callable, data: bytes, executor: Optional[Executor] = None) -> float:
+    timings: List[float] = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(data, executor)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    images = corpus()
+    with ProcessPoolExecutor() as processes, ThreadPoolExecutor() as threads:
+        pooled(next(iter(images.values())), processes)  # start the workers
+        print(f"{'image':<24} {'bytes':>9} {'naive':>9} {'serial':>9} {'threads':>9} {'processes':>9}  (ms)")
+        for name, data in images.items():
+            timings = [
+                best_of(naive, data),
+                best_of(serial, data),
+                best_of(pooled, data, threads),
+                best_of(pooled, data, processes),
+            ]
+            print(f"{name:<24} {len(data):>9} " + " ".join(f"{timing * 1e3:>9.1f}" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
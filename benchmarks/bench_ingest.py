@@ -0,0 +1,71 @@
+"""Peak memory of ingesting one base64 upload: the old decode/BytesIO/Pillow path against the buffer and sniffing.
+
+    poetry run python benchmarks/bench_ingest.py
+
+Peaks are traced allocations on top of the request body, which is what an upload adds to a Lambda's memory use.
+Peak RSS says little here: the allocator hands freed memory back to the next upload instead of to the system.
+"""
+import base64
+import time
+import tracemalloc
+from io import BytesIO
+from typing import Callable, Tuple
+
+from PIL import Image as ImageProcess
+
+from kaizen_blog_api.post.ingest import ViewReader, check_image, decode_image
+
+SIZES = [(1024, 768), (2048, 1536), (3000, 2000)]
+HEADER_BYTES = 64 * 1024
+# s3transfer reads uploads in multipart-sized chunks
+UPLOAD_CHUNK = 8 * 2 ** 20
+
+
+def encoded_image(width: int, height: int) -> str:
+    img = ImageProcess.effect_noise((width, height), 64).convert("RGB")
+    out = BytesIO()
+    img.save(out, "JPEG", quality=95)
+    return base64.b64encode(out.getvalue()).decode()
+
+
+def upload(reader: ViewReader) -> None:
+    while reader.read(UPLOAD_CHUNK):
+        pass
+
+
+def old(body: str) -> None:
+    """Decode to bytes, open a copy in Pillow to check it and take yet another copy to upload"""
+    buffer = BytesIO(base64.b64decode(body))
+    ImageProcess.open(buffer).verify()
+    upload(ViewReader(memoryview(buffer.getvalue())))
+
+
+def new(body: str) -> None:
+    view = decode_image(body, True)
+    check_image(view[:HEADER_BYTES], len(view))
+    upload(ViewReader(view))
+
+
+def measure(fn: Callable[[str], None], body: str) -> Tuple[float, float]:
+    fn(body)  # grow the reusable buffer, as the first upload in a container does
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(body)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20, elapsed * 1e3
+
+
+def main() -> None:
+    print(f"{'image':<12} {'base64 MB':>10} {'path':>5} {'peak MB':>8} {'ms':>7}")
+    for width, height in SIZES:
+        body = encoded_image(width, height)
+        for name, fn in (("old", old), ("new", new)):
+            peak, elapsed = measure(fn, body)
+            size = f"{width}x{height}"
+            print(f"{size:<12} {len(body) / 2 ** 20:>10.1f} {name:>5} {peak:>8.1f} {elapsed:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
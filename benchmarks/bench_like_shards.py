@@ -0,0 +1,53 @@
+"""Like throughput with concurrent writers, single counter against sharded counters, on moto.
+
+    poetry run python benchmarks/bench_like_shards.py
+
+moto has no partition throttling, so this measures the client-side cost of each mode (one UpdateItem against
+UpdateItem + BatchGetItem) rather than the hot-partition relief a real table gets from sharding.
+"""
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from moto import mock_dynamodb2
+
+from kaizen_blog_api.common import to_feed_item
+from kaizen_blog_api.post.entities import Post
+from kaizen_blog_api.post.repository import PostRepository
+
+WRITERS = 16
+LIKES = 800
+
+
+def run(table: object, like_shards: int) -> None:
+    repository = PostRepository(table, "images", None, like_shards=like_shards)
+    post = Post(id=uuid.uuid4(), text="viral post", username="user test")
+    table.put_item(Item=to_feed_item(post))  # type: ignore
+    for _ in range(like_shards):
+        repository.increment_likes(post.id)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WRITERS) as executor:
+        list(executor.map(lambda _: repository.increment_likes(post.id), range(LIKES)))
+    elapsed = time.perf_counter() - started
+
+    repository.compact_likes()
+    likes = repository.get(post.id).likes
+    print(f"shards={like_shards:<3} {LIKES / elapsed:8.0f} likes/s  total={likes}")
+
+
+def main() -> None:
+    with mock_dynamodb2():
+        table = boto3.resource("dynamodb", region_name="eu-west-1").create_table(
+            TableName="posts",
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        for like_shards in (0, 4, 16):
+            run(table, like_shards)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Response serialization cost: asdict + JSONEncoder against the compiled serializers.
+
+    poetry run python benchmarks/bench_serializers.py
+"""
+import json
+import timeit
+import uuid
+from dataclasses import asdict
+from typing import List
+
+from kaizen_blog_api.post.entities import Image, Post
+from kaizen_blog_api.serializers import JSONBackend, JSONEncoder, OrjsonBackend, SerializerRegistry, orjson
+
+ROUNDS = 5
+
+
+def make_posts(count: int) -> List[Post]:
+    posts = []
+    for num in range(count):
+        post_id = uuid.uuid4()
+        posts.append(
+            Post(
+                id=post_id,
+                text=f"Post number {num}",
+                username=f"user {num}",
+                image=Image(id=post_id, url=f"https://images.s3.amazonaws.com/posts/{post_id}.png"),
+            )
+        )
+    return posts
+
+
+def asdict_encoder(posts: List[Post]) -> str:
+    if len(posts) == 1:
+        return json.dumps(asdict(posts[0]), cls=JSONEncoder)
+    return json.dumps([asdict(post) for post in posts], cls=JSONEncoder)
+
+
+def main() -> None:
+    registries = {"compiled json": SerializerRegistry(JSONBackend())}
+    if orjson is not None:
+        registries["compiled orjson"] = SerializerRegistry(OrjsonBackend())
+
+    for count in (1, 10_000):
+        posts = make_posts(count)
+        number = 10_000 if count == 1 else 1
+        candidates = {"asdict + JSONEncoder": asdict_encoder}
+        for name, registry in registries.items():
+            candidates[name] = (
+                (lambda items, registry=registry: registry.dumps(items[0]))
+                if count == 1
+                else (lambda items, registry=registry: registry.dumps_many(items))
+            )
+        for name, fn in candidates.items():
+            best = min(timeit.repeat(lambda: fn(posts), number=number, repeat=ROUNDS)) / number
+            print(f"{count:>6} posts  {name:<22} {best * 1e6:12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
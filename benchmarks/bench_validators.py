@@ -0,0 +1,60 @@
+"""Per-item validation cost of a DynamoDB feed page.
+
+    poetry run python benchmarks/bench_validators.py
+"""
+import timeit
+import uuid
+from dataclasses import asdict
+from typing import Any, Dict, List
+
+from marshmallow_dataclass import class_schema
+
+from kaizen_blog_api.decoders import DecoderRegistry
+from kaizen_blog_api.post.entities import Post
+from kaizen_blog_api.serializers import dict_factory
+from kaizen_blog_api.validators import BaseSchema, SchemaRegistry
+
+ITEMS = 1000
+ROUNDS = 5
+
+
+def make_items(count: int) -> List[Dict[str, Any]]:
+    return [
+        asdict(Post(id=uuid.uuid4(), text=f"Post number {num}", username=f"user {num}"), dict_factory=dict_factory)
+        for num in range(count)
+    ]
+
+
+def schema_per_item(items: List[Dict[str, Any]]) -> None:
+    for item in items:
+        class_schema(Post, base_schema=BaseSchema)().load(item)
+
+
+def registry_load(items: List[Dict[str, Any]]) -> None:
+    registry = SchemaRegistry()
+    for item in items:
+        registry.load(item, Post)
+
+
+def registry_load_many(items: List[Dict[str, Any]]) -> None:
+    SchemaRegistry().load_many(items, Post)
+
+
+def trusted_load_many(items: List[Dict[str, Any]]) -> None:
+    DecoderRegistry().load_many(items, Post)
+
+
+def main() -> None:
+    items = make_items(ITEMS)
+    for name, fn in (
+        ("schema per item", schema_per_item),
+        ("registry load", registry_load),
+        ("registry load_many", registry_load_many),
+        ("trusted load_many", trusted_load_many),
+    ):
+        best = min(timeit.repeat(lambda: fn(items), number=1, repeat=ROUNDS))
+        print(f"{name:<20} {best * 1e6 / ITEMS:8.1f} us/item")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,9 @@ from os import environ
 import boto3
 from kink import di
 
+from kaizen_blog_api.cache import RecordCache
 from kaizen_blog_api.logger import create_logger
+from kaizen_blog_api.outbox import EventOutbox
 
 di["s3_client"] = boto3.client("s3", region_name=environ.get("AWS_REGION", "eu-west-1"))
 di["bucket_name"] = environ.get("OFFERS_IMAGES_BUCKET", "images")
@@ -14,10 +16,29 @@ di[Logger] = create_logger(os.getenv("LOG_LEVEL", "INFO"))
 di["dynamo_db"] = boto3.resource("dynamodb", region_name=environ.get("AWS_REGION", "eu-west-1"))
 
 di["posts_table"] = di["dynamo_db"].Table(environ.get("POSTS_TABLE", "posts"))
+di["like_shards"] = int(environ.get("POSTS_LIKE_SHARDS", "0"))
+di["feed_snapshot_size"] = int(environ.get("POSTS_FEED_SNAPSHOT_SIZE", "0"))
+di["posts_cache"] = RecordCache(
+    "posts", int(environ.get("POSTS_CACHE_SIZE", "0")), float(environ.get("POSTS_CACHE_TTL", "60")), di[Logger]
+)
 di["comments_table"] = di["dynamo_db"].Table(environ.get("COMMENTS_TABLE", "comments"))
+di["comments_cache"] = RecordCache(
+    "comments", int(environ.get("COMMENTS_CACHE_SIZE", "0")), float(environ.get("COMMENTS_CACHE_TTL", "60")), di[Logger]
+)
+di["admin_digest_size"] = int(environ.get("ADMIN_DIGEST_SIZE", "0"))
+di["admin_digest_max_pending"] = int(environ.get("ADMIN_DIGEST_MAX_PENDING", "200"))
 di["sns_client"] = boto3.client("sns", region_name=environ.get("AWS_REGION", "eu-west-1"))
 di["ses_client"] = boto3.client("ses", region_name=environ.get("AWS_REGION", "eu-west-1"))
 
 SNS_ARN = os.getenv("SNS_ARN", "arn:aws:sns:eu-west-1:123456789012:testing")
 ADMIN_EMAIL_ADDRESS = os.getenv("ADMIN_EMAIL_ADDRESS", "test@email.com")
 SENDER_EMAIL_ADDRESS = os.getenv("SENDER_EMAIL_ADDRESS", "amlluch@gmail.com")
+FEED_EPOCH = os.getenv("FEED_EPOCH", "2021-01")
+IMAGE_UPLOAD_MAX_SIZE = int(os.getenv("IMAGE_UPLOAD_MAX_SIZE", str(5 * 1024 * 1024)))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+IMAGE_UPLOAD_EXPIRES = int(os.getenv("IMAGE_UPLOAD_EXPIRES", "300"))
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "0"))
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+
+di["outbox"] = EventOutbox(di["sns_client"], SNS_ARN, di[Logger])
@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from logging import Logger
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+LOG_STATS_EVERY = 100
+
+
+class RecordCache(Generic[T]):
+    """In-process read-through cache of records by id, for Lambda containers that are reused between invocations.
+
+    Holds at most `size` records, evicting the least recently used one, and drops them `ttl` seconds after they
+    were read. A size of 0 turns it off. Hit, miss and eviction counters are logged every LOG_STATS_EVERY lookups.
+    Records are copied in and out, so callers can change what they get without touching the cached one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        size: int = 0,
+        ttl: float = 60.0,
+        logger: Optional[Logger] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self._size = size
+        self._ttl = ttl
+        self._logger = logger
+        self._clock = clock
+        self._records: "OrderedDict[str, Tuple[float, T]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._size > 0
+
+    def get(self, record_id: Any) -> Optional[T]:
+        if not self.enabled:
+            return None
+
+        key = str(record_id)
+        entry = self._records.get(key)
+        if entry is not None and entry[0] <= self._clock():
+            del self._records[key]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._records.move_to_end(key)
+        self._maybe_log_stats()
+        return None if entry is None else replace(entry[1])  # type: ignore
+
+    def put(self, record_id: Any, record: T) -> None:
+        if not self.enabled:
+            return
+
+        key = str(record_id)
+        self._records[key] = (self._clock() + self._ttl, replace(record))  # type: ignore
+        self._records.move_to_end(key)
+        while len(self._records) > self._size:
+            self._records.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, record_id: Any) -> None:
+        self._records.pop(str(record_id), None)
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._records)}
+
+    def log_stats(self) -> None:
+        if self._logger:
+            counters = " ".join(f"{name}={value}" for name, value in self.stats().items())
+            self._logger.info(f"{self.name} cache {counters}")
+
+    def _maybe_log_stats(self) -> None:
+        if (self.hits + self.misses) % LOG_STATS_EVERY == 0:
+            self.log_stats()
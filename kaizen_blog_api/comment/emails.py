@@ -0,0 +1,81 @@
+"""Admin emails about deleted comments. The templates are parsed once, when the module is imported, and every
+value put in the HTML bodies is escaped.
+"""
+from dataclasses import dataclass
+from html import escape
+from string import Template
+from typing import Dict, List
+
+from kaizen_blog_api.comment.entities import Comment
+
+DELETED_SUBJECT = Template("Comment on post $post_id was deleted")
+DELETED_TEXT = Template("The comment was created at $created_at by user $username with next text:\n\n$text")
+DELETED_HTML = Template(
+    """<html>
+<head></head>
+<body>
+  <h1>The comment was created at $created_at by user $username</h1>
+  <p>$text</p>
+</body>
+</html>
+"""
+)
+
+DIGEST_SUBJECT = Template("$count comments were deleted")
+DIGEST_TEXT = Template("$count comments were deleted:\n\n$entries")
+DIGEST_TEXT_ENTRY = Template("* Comment on post $post_id, created at $created_at by user $username:\n\n$text\n")
+DIGEST_HTML = Template(
+    """<html>
+<head></head>
+<body>
+  <h1>$count comments were deleted</h1>
+  <ul>
+$entries
+  </ul>
+</body>
+</html>
+"""
+)
+DIGEST_HTML_ENTRY = Template(
+    "    <li><p>Comment on post $post_id, created at $created_at by user $username</p><p>$text</p></li>"
+)
+
+
+@dataclass
+class Email:
+    subject: str
+    text: str
+    html: str
+
+
+def _values(comment: Comment, html: bool = False) -> Dict[str, str]:
+    values = {
+        "post_id": str(comment.post_id),
+        "created_at": str(comment.created_at),
+        "username": comment.username,
+        "text": comment.text,
+    }
+    return {name: escape(value) for name, value in values.items()} if html else values
+
+
+def deleted_email(comment: Comment) -> Email:
+    return Email(
+        subject=DELETED_SUBJECT.substitute(_values(comment)),
+        text=DELETED_TEXT.substitute(_values(comment)),
+        html=DELETED_HTML.substitute(_values(comment, html=True)),
+    )
+
+
+def digest_email(comments: List[Comment]) -> Email:
+    """One email listing every comment deleted since the previous digest, oldest deletion first"""
+    count = len(comments)
+    return Email(
+        subject=DIGEST_SUBJECT.substitute(count=count),
+        text=DIGEST_TEXT.substitute(
+            count=count, entries="\n".join(DIGEST_TEXT_ENTRY.substitute(_values(comment)) for comment in comments)
+        ),
+        html=DIGEST_HTML.substitute(
+            count=count,
+            entries="\n".join(DIGEST_HTML_ENTRY.substitute(_values(comment, html=True)) for comment in comments),
+        ),
+    )
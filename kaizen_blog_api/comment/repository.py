@@ -1,19 +1,41 @@
 import json
 import uuid
-from dataclasses import asdict
-from typing import Iterable, Protocol, runtime_checkable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Protocol, runtime_checkable
 
+from boto3.dynamodb import conditions
 from botocore.client import BaseClient
 from botocore.exceptions import ClientError
 from kink import inject
 
 from kaizen_blog_api import SNS_ARN
+from kaizen_blog_api.cache import RecordCache
+from kaizen_blog_api.comment.emails import Email, deleted_email, digest_email
 from kaizen_blog_api.comment.entities import Comment
-from kaizen_blog_api.common import get_record
-from kaizen_blog_api.errors import AWSError, RepositoryError
+from kaizen_blog_api.common import (
+    FeedBucketMarker,
+    Page,
+    feed_bucket,
+    get_record,
+    get_records,
+    is_condition_failure,
+    query_feed,
+    query_page,
+    to_feed_item,
+)
+from kaizen_blog_api.decoders import decoders
+from kaizen_blog_api.errors import AWSError, RecordNotFound
 from kaizen_blog_api.events import Event
-from kaizen_blog_api.serializers import dict_factory
-from kaizen_blog_api.validators import validate_and_get_dataclass
+from kaizen_blog_api.outbox import EventOutbox
+from kaizen_blog_api.serializers import to_item
+
+# Single item buffering deletions for the admin digest. Without feed_bucket or post_id it stays out of the indexes
+DIGEST_ID = "digest#pending"
+
+# Threads running the by_post queries of a batch read. They spend their time waiting on DynamoDB, not on the CPU
+BATCH_QUERY_WORKERS = 8
+
+_batch_executor: Optional[ThreadPoolExecutor] = None
 
 
 @runtime_checkable
@@ -24,92 +46,179 @@ class ICommentRepository(Protocol):
     def dispatch_sns(self, event: Event) -> None:
         ...
 
-    def get(self, comment_id: uuid.UUID) -> Comment:
+    def get(self, comment_id: uuid.UUID, consistent_read: bool = False) -> Comment:
+        ...
+
+    def get_many(self, comment_ids: Iterable[uuid.UUID], consistent_read: bool = False) -> List[Comment]:
         ...
 
-    def delete(self, comment_id: uuid.UUID) -> None:
+    def delete(self, comment_id: uuid.UUID) -> Comment:
         ...
 
     def send_email(self, recipient: str, comment: Comment, sender: str) -> None:
         ...
 
-    def list_by_date_reversed(self) -> Iterable[Comment]:
+    def buffer_deletion(self, comment: Comment, max_pending: int) -> Optional[int]:
+        ...
+
+    def take_deletions(self) -> List[Comment]:
+        ...
+
+    def restore_deletions(self, comments: List[Comment]) -> None:
+        ...
+
+    def send_digest(self, recipient: str, comments: List[Comment], sender: str) -> None:
+        ...
+
+    def list_by_date_reversed(self, limit: int, cursor: Optional[str] = None) -> Page[Comment]:
+        ...
+
+    def list_by_post(self, post_id: uuid.UUID, limit: int, cursor: Optional[str] = None) -> Page[Comment]:
+        ...
+
+    def list_by_posts(self, post_ids: Iterable[uuid.UUID], limit: int) -> Dict[uuid.UUID, List[Comment]]:
         ...
 
 
 @inject(alias=ICommentRepository)
 class CommentRepository(ICommentRepository):
-    def __init__(self, comments_table: BaseClient, sns_client: BaseClient, ses_client: BaseClient):
+    def __init__(
+        self,
+        comments_table: BaseClient,
+        sns_client: BaseClient,
+        ses_client: BaseClient,
+        comments_cache: Optional[RecordCache[Comment]] = None,
+        outbox: Optional[EventOutbox] = None,
+    ):
         self.table = comments_table
         self.sns = sns_client
         self.ses = ses_client
+        self._outbox = outbox
+        self._cache = comments_cache if comments_cache is not None else RecordCache("comments")
+        self._feed_buckets = FeedBucketMarker(comments_table)
 
     def insert(self, comment: Comment) -> None:
+        self._feed_buckets.note(feed_bucket(comment.created_at))
         try:
-            self.table.put_item(Item=asdict(comment, dict_factory=dict_factory))
+            self.table.put_item(Item=to_feed_item(comment))
         except ClientError as e:
             raise AWSError(f"AWS error {e.response['Error']['Code']} inserting {str(comment.id)}") from e
 
     def dispatch_sns(self, event: Event) -> None:
+        """Publishes the event, or queues it in the outbox to be sent in a batch when the invocation ends"""
         message_attributes = {"action": {"DataType": "String", "StringValue": event.name}}
+        message = json.dumps({"default": json.dumps(to_item(event))})
+        if self._outbox is not None:
+            self._outbox.add(message, message_attributes, structure="json")
+            return
         self.sns.publish(
             TopicArn=SNS_ARN,
-            Message=json.dumps({"default": json.dumps(asdict(event, dict_factory=dict_factory))}),
+            Message=message,
             MessageStructure="json",
             MessageAttributes=message_attributes,
         )
 
-    def get(self, comment_id: uuid.UUID) -> Comment:
-        return get_record(comment_id, Comment, self.table)
+    def get(self, comment_id: uuid.UUID, consistent_read: bool = False) -> Comment:
+        cached = None if consistent_read else self._cache.get(comment_id)
+        if cached is not None:
+            return cached
+
+        comment = get_record(comment_id, Comment, self.table, consistent_read)
+        self._cache.put(comment_id, comment)
+        return comment
 
-    def list_by_date_reversed(self) -> Iterable[Comment]:
-        result = self.table.scan(IndexName="by_date")
-        if result["ResponseMetadata"]["HTTPStatusCode"] not in range(200, 300):
-            raise RepositoryError("error occurred when retrieving post details")
-        for item in reversed(result["Items"]):
-            yield validate_and_get_dataclass(item, Comment)
+    def get_many(self, comment_ids: Iterable[uuid.UUID], consistent_read: bool = False) -> List[Comment]:
+        return get_records(comment_ids, Comment, self.table, consistent_read)
 
-    def delete(self, comment_id: uuid.UUID) -> None:
+    def list_by_date_reversed(self, limit: int, cursor: Optional[str] = None) -> Page[Comment]:
+        return query_feed(self.table, Comment, limit, cursor)
+
+    def list_by_post(self, post_id: uuid.UUID, limit: int, cursor: Optional[str] = None) -> Page[Comment]:
+        condition = conditions.Key("post_id").eq(str(post_id))
+        return query_page(self.table, Comment, "by_post", condition, limit, cursor)
+
+    def list_by_posts(self, post_ids: Iterable[uuid.UUID], limit: int) -> Dict[uuid.UUID, List[Comment]]:
+        """One by_post query per post, run concurrently; the boto3 client underneath is thread safe"""
+        global _batch_executor
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(max_workers=BATCH_QUERY_WORKERS)
+        futures = {post_id: _batch_executor.submit(self.list_by_post, post_id, limit) for post_id in post_ids}
+        return {post_id: future.result().items for post_id, future in futures.items()}
+
+    def delete(self, comment_id: uuid.UUID) -> Comment:
+        self._cache.invalidate(comment_id)
         try:
-            self.table.delete_item(Key={"id": str(comment_id)})
+            result = self.table.delete_item(
+                Key={"id": str(comment_id)},
+                ConditionExpression="attribute_exists(id)",
+                ReturnValues="ALL_OLD",
+            )
         except ClientError as e:
+            if is_condition_failure(e):
+                raise RecordNotFound(f"Record with id {comment_id} was not found") from e
             raise AWSError(f"AWS error {e.response['Error']['Code']} updating record {str(comment_id)}") from e
+        return decoders.load(result["Attributes"], Comment)
 
     def send_email(self, recipient: str, comment: Comment, sender: str) -> None:
-        destination = {
-            "ToAddresses": [
-                recipient,
-            ],
-        }
-        subject = f"Comment on post {comment.post_id} was deleted"
-        body_text = f"The comment was created at {comment.created_at} by user {comment.username} with next text:\n\n{comment.text}"
-        body_html = f"""<html>
-        <head></head>
-        <body>
-          <h1>The comment was created at {comment.created_at} by user {comment.username}</h1>
-          <p>{comment.text}</p>
-        </body>
-        </html>
-                    """
-        charset = "UTF-8"
+        self._send(recipient, deleted_email(comment), sender)
 
+    def buffer_deletion(self, comment: Comment, max_pending: int) -> Optional[int]:
+        """Appends a deleted comment to the pending digest. Returns the number of deletions waiting in it, or None
+        if `max_pending` were already waiting and the deletion was not buffered
+        """
+        try:
+            result = self.table.update_item(
+                Key={"id": DIGEST_ID},
+                UpdateExpression="SET deletions = list_append(if_not_exists(deletions, :empty), :deletion)",
+                ConditionExpression="attribute_not_exists(deletions) OR size(deletions) < :max",
+                ExpressionAttributeValues={":empty": [], ":deletion": [to_item(comment)], ":max": max_pending},
+                ReturnValues="UPDATED_NEW",
+            )
+        except ClientError as e:
+            if is_condition_failure(e):
+                return None
+            raise AWSError(f"AWS error {e.response['Error']['Code']} buffering deletion of {comment.id}") from e
+        return len(result["Attributes"]["deletions"])
+
+    def take_deletions(self) -> List[Comment]:
+        """Empties the pending digest in one atomic update, so concurrent flushes never send a deletion twice"""
+        try:
+            result = self.table.update_item(
+                Key={"id": DIGEST_ID},
+                UpdateExpression="REMOVE deletions",
+                ConditionExpression="attribute_exists(deletions)",
+                ReturnValues="UPDATED_OLD",
+            )
+        except ClientError as e:
+            if is_condition_failure(e):
+                return []
+            raise AWSError(f"AWS error {e.response['Error']['Code']} reading pending deletions") from e
+        return decoders.load_many(result["Attributes"]["deletions"], Comment)
+
+    def restore_deletions(self, comments: List[Comment]) -> None:
+        """Puts back deletions whose digest could not be sent, ahead of any buffered since"""
+        try:
+            self.table.update_item(
+                Key={"id": DIGEST_ID},
+                UpdateExpression="SET deletions = list_append(:deletions, if_not_exists(deletions, :empty))",
+                ExpressionAttributeValues={":empty": [], ":deletions": [to_item(comment) for comment in comments]},
+            )
+        except ClientError as e:
+            raise AWSError(f"AWS error {e.response['Error']['Code']} restoring pending deletions") from e
+
+    def send_digest(self, recipient: str, comments: List[Comment], sender: str) -> None:
+        self._send(recipient, digest_email(comments), sender)
+
+    def _send(self, recipient: str, email: Email, sender: str) -> None:
+        charset = "UTF-8"
         message = {
             "Body": {
-                "Html": {
-                    "Charset": charset,
-                    "Data": body_html,
-                },
-                "Text": {
-                    "Charset": charset,
-                    "Data": body_text,
-                },
-            },
-            "Subject": {
-                "Charset": charset,
-                "Data": subject,
+                "Html": {"Charset": charset, "Data": email.html},
+                "Text": {"Charset": charset, "Data": email.text},
             },
+            "Subject": {"Charset": charset, "Data": email.subject},
         }
         try:
-            self.ses.send_email(Destination=destination, Message=message, Source=sender)
+            self.ses.send_email(Destination={"ToAddresses": [recipient]}, Message=message, Source=sender)
         except ClientError as e:
             raise AWSError(f"AWS error {e.response['Error']['Code']} sending email to admin") from e
@@ -1,17 +1,22 @@
 import json
 import uuid
-from dataclasses import dataclass
-from typing import Iterable, Protocol, runtime_checkable
+from dataclasses import dataclass, field
+from logging import Logger
+from typing import Dict, List, Optional, Protocol, runtime_checkable
 
 from kink import inject
+from marshmallow.validate import Length
 
 from kaizen_blog_api import ADMIN_EMAIL_ADDRESS, SENDER_EMAIL_ADDRESS
 from kaizen_blog_api.comment.entities import Comment
 from kaizen_blog_api.comment.repository import ICommentRepository
-from kaizen_blog_api.common import BaseRequestClass, request_to_insert
+from kaizen_blog_api.common import BaseListRequest, BaseRequestClass, Page, limit_field, request_to_insert
+from kaizen_blog_api.errors import AWSError
 from kaizen_blog_api.events import CommentDeletedEvent, Event
 from kaizen_blog_api.validators import validate_and_get_dataclass
 
+MAX_BATCH_POSTS = 25
+
 
 @dataclass
 class CreateCommentRequest:
@@ -30,6 +35,24 @@ class DeleteCommentRequest(BaseRequestClass):
     pass
 
 
+@dataclass
+class ListCommentsRequest(BaseListRequest):
+    pass
+
+
+@dataclass
+class ListPostCommentsRequest:
+    post_id: uuid.UUID
+    limit: int = limit_field()
+    cursor: Optional[str] = None
+
+
+@dataclass
+class ListCommentsForPostsRequest:
+    post_ids: List[uuid.UUID] = field(metadata={"validate": Length(min=1, max=MAX_BATCH_POSTS)})
+    limit: int = limit_field(default=10)
+
+
 @runtime_checkable
 class ICommentService(Protocol):
     def create(self, request: CreateCommentRequest) -> Comment:
@@ -41,17 +64,35 @@ class ICommentService(Protocol):
     def notify(self, request: Event) -> None:
         ...
 
+    def flush_digest(self) -> int:
+        ...
+
     def read(self, request: GetCommentRequest) -> Comment:
         ...
 
-    def list_reversed(self) -> Iterable[Comment]:
+    def list_reversed(self, request: ListCommentsRequest) -> Page[Comment]:
+        ...
+
+    def list_for_post(self, request: ListPostCommentsRequest) -> Page[Comment]:
+        ...
+
+    def list_for_posts(self, request: ListCommentsForPostsRequest) -> Dict[uuid.UUID, List[Comment]]:
         ...
 
 
-@inject(alias=ICommentService)
+@inject(alias=ICommentService, bind={"logger": Logger})
 class CommentService(ICommentService):
-    def __init__(self, repository: ICommentRepository):
+    def __init__(
+        self,
+        repository: ICommentRepository,
+        admin_digest_size: int = 0,
+        logger: Optional[Logger] = None,
+        admin_digest_max_pending: int = 200,
+    ):
         self._repository = repository
+        self._digest_size = admin_digest_size
+        self._logger = logger
+        self._max_pending = admin_digest_max_pending
 
     def create(self, request: CreateCommentRequest) -> Comment:
         data = request_to_insert(request)
@@ -60,19 +101,71 @@ class CommentService(ICommentService):
         return comment
 
     def delete(self, request: DeleteCommentRequest) -> None:
-        comment = self._repository.get(request.id)
-        self._repository.delete(request.id)
+        comment = self._repository.delete(request.id)
         self._repository.dispatch_sns(CommentDeletedEvent(comment))
 
     def notify(self, request: Event) -> None:
         payload = json.loads(request.payload)
         comment = validate_and_get_dataclass(payload, Comment)
-        self._repository.send_email(ADMIN_EMAIL_ADDRESS, comment, SENDER_EMAIL_ADDRESS)
+        if not self._digest_size:
+            self._repository.send_email(ADMIN_EMAIL_ADDRESS, comment, SENDER_EMAIL_ADDRESS)
+        elif self._buffer_deletion(comment) >= self._digest_size:
+            # The deletion is safely buffered, so failing here would only get the message delivered and buffered
+            # again. A digest that cannot be sent now is left to the scheduled flush_admin_digest
+            try:
+                self.flush_digest()
+            except AWSError as e:
+                if self._logger:
+                    self._logger.warning(f"Admin digest not sent, left for the scheduled flush: {e}")
+
+    def _buffer_deletion(self, comment: Comment) -> int:
+        """Buffers the deletion, returning the number waiting. The buffer only fills up while digests keep failing:
+        it is drained once, and if that fails too the deletion is logged and given up, since retrying the message
+        would fail the same way
+        """
+        pending = self._repository.buffer_deletion(comment, self._max_pending)
+        if pending is None:
+            try:
+                self.flush_digest()
+                pending = self._repository.buffer_deletion(comment, self._max_pending)
+            except AWSError as e:
+                if self._logger:
+                    self._logger.warning(f"Admin digest not sent: {e}")
+        if pending is None:
+            if self._logger:
+                self._logger.error(
+                    f"Admin digest is full, deletion not notified: comment {comment.id} on post {comment.post_id} "
+                    f"created at {comment.created_at} by {comment.username}: {comment.text}"
+                )
+            return 0
+        return pending
+
+    def flush_digest(self) -> int:
+        """Sends the buffered deletions in emails of at most `admin_digest_size`. Returns the number of deletions sent.
+
+        If an email fails, the deletions it and the following ones hold are put back and the error is raised.
+        """
+        comments = self._repository.take_deletions()
+        if not comments:
+            return 0
+        size = self._digest_size or len(comments)
+        for start in range(0, len(comments), size):
+            chunk = comments[start : start + size]  # noqa: E203
+            try:
+                self._repository.send_digest(ADMIN_EMAIL_ADDRESS, chunk, SENDER_EMAIL_ADDRESS)
+            except Exception:
+                self._repository.restore_deletions(comments[start:])
+                raise
+        return len(comments)
 
     def read(self, request: GetCommentRequest) -> Comment:
         return self._repository.get(request.id)
 
-    def list_reversed(self) -> Iterable[Comment]:
-        comments = self._repository.list_by_date_reversed()
-        for comment in comments:
-            yield comment
+    def list_reversed(self, request: ListCommentsRequest) -> Page[Comment]:
+        return self._repository.list_by_date_reversed(request.limit, request.cursor)
+
+    def list_for_post(self, request: ListPostCommentsRequest) -> Page[Comment]:
+        return self._repository.list_by_post(request.post_id, request.limit, request.cursor)
+
+    def list_for_posts(self, request: ListCommentsForPostsRequest) -> Dict[uuid.UUID, List[Comment]]:
+        return self._repository.list_by_posts(request.post_ids, request.limit)
@@ -1,34 +1,320 @@
+import base64
+import binascii
+import json
+import random
+import time
 import uuid
-from dataclasses import asdict, dataclass
-from typing import Any, Dict, Type, TypeVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Generic, Iterable, List, Optional, Sequence, Type, TypeVar, Union, overload
 
 from boto3.dynamodb import conditions
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+from marshmallow.validate import Range
 
-from kaizen_blog_api.errors import RecordNotFound, RepositoryError
-from kaizen_blog_api.serializers import dict_factory
-from kaizen_blog_api.validators import validate_and_get_dataclass
+from kaizen_blog_api import FEED_EPOCH
+from kaizen_blog_api.decoders import decoders
+from kaizen_blog_api.errors import AWSError, RecordNotFound, RepositoryError, ValidationError
+from kaizen_blog_api.serializers import Sparse, to_item
 
 T = TypeVar("T")
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# Newest-first feed index: HASH feed_bucket (the "YYYY-MM" of created_at), RANGE created_at
+FEED_INDEX = "by_feed"
+FEED_BUCKET = "feed_bucket"
+# Projected feed reads keep the key attributes so LastEvaluatedKey can always be built from the last item
+FEED_KEYS = ("id", FEED_BUCKET, "created_at")
+# Item recording the oldest feed bucket written to the table, so reads stop walking back there. It has no
+# feed_bucket, so it stays out of the feed index
+FEED_OLDEST_ID = "feed#oldest"
+
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_ATTEMPTS = 5
+BATCH_GET_BACKOFF = 0.05
+
+_type_serializer = TypeSerializer()
+_type_deserializer = TypeDeserializer()
+
 
 @dataclass
 class BaseRequestClass:
     id: uuid.UUID
 
 
-def get_record(record_id: uuid.UUID, dataclass: Type[T], table: Any) -> T:
-    condition = conditions.Key("id").eq(str(record_id))
-    result = table.query(KeyConditionExpression=condition)
+def limit_field(default: int = DEFAULT_PAGE_SIZE) -> Any:
+    return field(default=default, metadata={"validate": Range(min=1, max=MAX_PAGE_SIZE)})
+
+
+@dataclass
+class BaseListRequest:
+    limit: int = limit_field()
+    cursor: Optional[str] = None
+
+
+@dataclass
+class Page(Generic[T]):
+    items: List[T]
+    cursor: Optional[str] = None
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Opaque cursor for a pagination state, kept in DynamoDB wire format so numbers survive untouched"""
+    wire = {name: _type_serializer.serialize(value) for name, value in state.items()}
+    return base64.urlsafe_b64encode(json.dumps(wire).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        wire = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {name: _type_deserializer.deserialize(value) for name, value in wire.items()}
+    except (binascii.Error, ValueError, TypeError, AttributeError):
+        raise ValidationError({"cursor": ["Invalid cursor."]})
+
+
+def is_condition_failure(error: ClientError) -> bool:
+    return error.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+
+def projection(fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """ProjectionExpression kwargs for the given attributes, through placeholders so reserved words are safe.
+
+    Repeated attributes are read once, since DynamoDB rejects overlapping paths.
+    """
+    if not fields:
+        return {}
+    names = {f"#p{position}": name for position, name in enumerate(dict.fromkeys(fields))}
+    return {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+
+
+def get_item(
+    record_id: Union[uuid.UUID, str],
+    table: Any,
+    fields: Optional[Sequence[str]] = None,
+    consistent_read: bool = False,
+) -> Dict[str, Any]:
+    try:
+        result = table.get_item(Key={"id": str(record_id)}, ConsistentRead=consistent_read, **projection(fields))
+    except ClientError as e:
+        raise AWSError(f"AWS error {e.response['Error']['Code']} retrieving record {str(record_id)}") from e
 
     if result["ResponseMetadata"]["HTTPStatusCode"] not in range(200, 300):
-        raise RepositoryError("error occurred when retrieving post details")
+        raise RepositoryError("error occurred when retrieving record details")
 
-    if not result["Count"]:
+    if "Item" not in result:
         raise RecordNotFound(f"Record with id {record_id} was not found")
-    return validate_and_get_dataclass(result["Items"][0], dataclass)
+    return result["Item"]
+
+
+def get_record(record_id: uuid.UUID, dataclass: Type[T], table: Any, consistent_read: bool = False) -> T:
+    return decoders.load(get_item(record_id, table, consistent_read=consistent_read), dataclass)
+
+
+def get_sparse_record(record_id: uuid.UUID, dataclass: Type[T], table: Any, fields: Sequence[str]) -> Sparse[T]:
+    return decoders.load_sparse(get_item(record_id, table, fields), dataclass, fields)
+
+
+def batch_get_items(
+    table: Any,
+    keys: List[Dict[str, Any]],
+    fields: Optional[Sequence[str]] = None,
+    consistent_read: bool = False,
+    max_attempts: int = BATCH_GET_MAX_ATTEMPTS,
+    backoff: float = BATCH_GET_BACKOFF,
+) -> List[Dict[str, Any]]:
+    """BatchGetItem on a single table, retrying whatever DynamoDB leaves unprocessed with exponential backoff"""
+    items: List[Dict[str, Any]] = []
+    for start in range(0, len(keys), BATCH_GET_MAX_KEYS):
+        chunk = keys[start : start + BATCH_GET_MAX_KEYS]  # noqa: E203
+        request = {table.name: {"Keys": chunk, "ConsistentRead": consistent_read, **projection(fields)}}
+        for attempt in range(max_attempts):
+            if attempt:
+                time.sleep(random.uniform(0, backoff * 2 ** attempt))
+            try:
+                result = table.meta.client.batch_get_item(RequestItems=request)
+            except ClientError as e:
+                raise AWSError(f"AWS error {e.response['Error']['Code']} retrieving records") from e
+            items.extend(result["Responses"].get(table.name, []))
+            request = result.get("UnprocessedKeys") or {}
+            if not request:
+                break
+        else:
+            unprocessed = len(request[table.name]["Keys"])
+            raise RepositoryError(f"{unprocessed} records left unprocessed after {max_attempts} attempts")
+    return items
+
+
+def get_records(
+    record_ids: Iterable[uuid.UUID], dataclass: Type[T], table: Any, consistent_read: bool = False
+) -> List[T]:
+    """Loads several records in as few round trips as possible, in the order of `record_ids`, skipping missing ones"""
+    ids = list(dict.fromkeys(str(record_id) for record_id in record_ids))
+    keys = [{"id": record_id} for record_id in ids]
+    items = {item["id"]: item for item in batch_get_items(table, keys, consistent_read=consistent_read)}
+    return decoders.load_many((items[record_id] for record_id in ids if record_id in items), dataclass)
+
+
+def query_page(
+    table: Any,
+    dataclass: Type[T],
+    index_name: str,
+    key_condition: Any,
+    limit: int,
+    cursor: Optional[str] = None,
+    newest_first: bool = False,
+) -> Page[T]:
+    kwargs: Dict[str, Any] = {
+        "IndexName": index_name,
+        "KeyConditionExpression": key_condition,
+        "ScanIndexForward": not newest_first,
+        "Limit": limit,
+    }
+    if cursor:
+        kwargs["ExclusiveStartKey"] = decode_cursor(cursor)
+
+    items: List[Dict[str, Any]] = []
+    while True:
+        result = table.query(**kwargs)
+        if result["ResponseMetadata"]["HTTPStatusCode"] not in range(200, 300):
+            raise RepositoryError("error occurred when retrieving records")
+        items.extend(result["Items"])
+        last_key = result.get("LastEvaluatedKey")
+        if not last_key or len(items) >= limit:
+            break
+        kwargs["ExclusiveStartKey"] = last_key
+        kwargs["Limit"] = limit - len(items)
+
+    return Page(decoders.load_many(items, dataclass), encode_cursor(last_key) if last_key else None)
+
+
+def feed_bucket(created_at: datetime) -> str:
+    return created_at.strftime("%Y-%m")
+
+
+def previous_bucket(bucket: str) -> str:
+    year, month = map(int, bucket.split("-"))
+    return f"{year - 1}-12" if month == 1 else f"{year}-{month - 1:02d}"
+
+
+def to_feed_item(entity: Any) -> Dict[str, Any]:
+    item = to_item(entity)
+    item[FEED_BUCKET] = feed_bucket(entity.created_at)
+    return item
+
+
+def feed_cursor(item: Dict[str, Any]) -> str:
+    """Cursor resuming a feed read right after `item`, which must carry the feed keys"""
+    return encode_cursor({"bucket": item[FEED_BUCKET], "key": {name: item[name] for name in FEED_KEYS}})
+
+
+def note_feed_bucket(table: Any, bucket: str) -> None:
+    """Lowers the oldest feed bucket recorded for the table to `bucket`, if it is older"""
+    try:
+        table.update_item(
+            Key={"id": FEED_OLDEST_ID},
+            UpdateExpression="SET oldest_bucket = :bucket",
+            ConditionExpression="attribute_not_exists(oldest_bucket) OR oldest_bucket > :bucket",
+            ExpressionAttributeValues={":bucket": bucket},
+        )
+    except ClientError as e:
+        if not is_condition_failure(e):
+            raise AWSError(f"AWS error {e.response['Error']['Code']} recording the oldest feed bucket") from e
+
+
+class FeedBucketMarker:
+    """Notes the feed buckets a repository writes to, remembering the oldest one so that later writes in the same
+    or a newer bucket skip the conditional update.
+
+    Call it before writing the record: if it fails, nothing was written and the request can be retried as it is.
+    """
+
+    def __init__(self, table: Any) -> None:
+        self._table = table
+        self._oldest: Optional[str] = None
+
+    def note(self, bucket: str) -> None:
+        if self._oldest is not None and self._oldest <= bucket:
+            return
+        note_feed_bucket(self._table, bucket)
+        self._oldest = bucket
+
+
+def oldest_feed_bucket(table: Any) -> str:
+    """Bucket where feed reads stop: the oldest one recorded, or FEED_EPOCH for tables that have none yet"""
+    try:
+        item = get_item(FEED_OLDEST_ID, table, ["oldest_bucket"])
+    except RecordNotFound:
+        return FEED_EPOCH
+    return max(FEED_EPOCH, item.get("oldest_bucket", FEED_EPOCH))
+
+
+@overload
+def query_feed(
+    table: Any, dataclass: Type[T], limit: int, cursor: Optional[str] = None, fields: None = None
+) -> Page[T]:
+    ...
+
+
+@overload
+def query_feed(
+    table: Any, dataclass: Type[T], limit: int, cursor: Optional[str], fields: Optional[Sequence[str]]
+) -> Page[Union[T, Sparse[T]]]:
+    ...
+
+
+def query_feed(
+    table: Any,
+    dataclass: Type[T],
+    limit: int,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Page[Any]:
+    """Reads at most `limit` records newest first, walking the monthly feed buckets backwards.
+
+    The walk stops at the oldest bucket recorded by `note_feed_bucket`, which is only read once the first bucket
+    runs out. Records older than FEED_EPOCH are never listed, wherever they are. With `fields`, only those
+    attributes are read and the page holds Sparse records.
+    """
+    if cursor:
+        state = decode_cursor(cursor)
+        bucket, start_key = state.get("bucket"), state.get("key")
+        if not isinstance(bucket, str):
+            raise ValidationError({"cursor": ["Invalid cursor."]})
+    else:
+        bucket, start_key = feed_bucket(datetime.utcnow()), None
+
+    items: List[Dict[str, Any]] = []
+    oldest: Optional[str] = None
+    while len(items) < limit and bucket >= (oldest or FEED_EPOCH):
+        kwargs: Dict[str, Any] = {
+            "IndexName": FEED_INDEX,
+            "KeyConditionExpression": conditions.Key(FEED_BUCKET).eq(bucket),
+            "ScanIndexForward": False,
+            "Limit": limit - len(items),
+            **projection(fields and [*fields, *FEED_KEYS]),
+        }
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        result = table.query(**kwargs)
+        if result["ResponseMetadata"]["HTTPStatusCode"] not in range(200, 300):
+            raise RepositoryError("error occurred when retrieving records")
+        items.extend(result["Items"])
+        start_key = result.get("LastEvaluatedKey")
+        if not start_key:
+            oldest = oldest or oldest_feed_bucket(table)
+            bucket = previous_bucket(bucket)
+
+    has_more = bucket >= (oldest or FEED_EPOCH)
+    next_cursor = encode_cursor({"bucket": bucket, "key": start_key}) if has_more else None
+    if fields:
+        return Page(decoders.load_sparse_many(items, dataclass, fields), next_cursor)
+    return Page(decoders.load_many(items, dataclass), next_cursor)
 
 
 def request_to_insert(request: T) -> Dict:
-    data = {name: value for name, value in asdict(request, dict_factory=dict_factory).items() if value is not None}
+    data = to_item(request)
     data["id"] = uuid.uuid4()
     return data
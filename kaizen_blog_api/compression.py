@@ -0,0 +1,72 @@
+import gzip
+import zlib
+from typing import Callable, Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is only used when it is packaged with the Lambda
+    brotli = None
+
+from kaizen_blog_api import COMPRESSION_LEVEL, COMPRESSION_MIN_SIZE
+
+Compressor = Callable[[bytes, int], bytes]
+
+
+def _brotli(data: bytes, level: int) -> bytes:
+    # Brotli qualities go up to 11 where zlib levels stop at 9
+    return brotli.compress(data, quality=min(level, 11))
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    # A fixed mtime gives the same bytes for the same body
+    return gzip.compress(data, compresslevel=min(level, 9), mtime=0)
+
+
+def _deflate(data: bytes, level: int) -> bytes:
+    # HTTP deflate is the zlib format, not a raw deflate stream
+    return zlib.compress(data, min(level, 9))
+
+
+# In order of preference when the client accepts several with the same weight
+COMPRESSORS: Dict[str, Compressor] = {"gzip": _gzip, "deflate": _deflate}
+if brotli is not None:
+    COMPRESSORS = {"br": _brotli, **COMPRESSORS}
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Content codings of an Accept-Encoding header with their weights"""
+    weights = {}
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.strip().partition(";")
+        if not coding:
+            continue
+        weight = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    return weights
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best content coding we can produce for the header, or None to send the body as it is"""
+    if not accept_encoding:
+        return None
+    weights = accepted_encodings(accept_encoding)
+    best, best_weight = None, 0.0
+    for coding in COMPRESSORS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def should_compress(body: str, min_size: int = COMPRESSION_MIN_SIZE) -> bool:
+    return len(body) >= min_size
+
+
+def compress(body: str, coding: str, level: int = COMPRESSION_LEVEL) -> bytes:
+    return COMPRESSORS[coding](body.encode(), level)
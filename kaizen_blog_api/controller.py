@@ -1,27 +1,85 @@
 import json
-from dataclasses import asdict
+import uuid
+from datetime import timezone
+from email.utils import format_datetime
 from logging import Logger
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote_plus
 
 from kink import inject
 
+from kaizen_blog_api.comment.entities import Comment
 from kaizen_blog_api.comment.service import (
     CreateCommentRequest,
     DeleteCommentRequest,
     GetCommentRequest,
     ICommentService,
+    ListCommentsForPostsRequest,
+    ListCommentsRequest,
+    ListPostCommentsRequest,
 )
+from kaizen_blog_api.common import Page
 from kaizen_blog_api.custom_types import LambdaContext, LambdaEvent, LambdaResponse
+from kaizen_blog_api.decoders import decoders
+from kaizen_blog_api.errors import ImageError, RecordNotFound, ValidationError
 from kaizen_blog_api.events import Event
+from kaizen_blog_api.post.entities import Image, Post
+from kaizen_blog_api.post.repository import PostView
 from kaizen_blog_api.post.service import (
+    CreateImageUploadRequest,
     CreatePostRequest,
     GetPostRequest,
     IPostService,
     LikePostRequest,
+    ListPostsRequest,
     UpdateImageRequest,
 )
-from kaizen_blog_api.serializers import JSONEncoder
+from kaizen_blog_api.serializers import Sparse, json_serializers, to_json, to_json_grouped, to_json_many
 from kaizen_blog_api.serverless import serverless
-from kaizen_blog_api.validators import validate_and_get_dataclass
+from kaizen_blog_api.validators import schemas, validate_and_get_dataclass
+
+# Compile every schema while the Lambda container is initialising, not on the first request
+schemas.warm(
+    Post,
+    Image,
+    Comment,
+    Event,
+    CreatePostRequest,
+    CreateImageUploadRequest,
+    GetPostRequest,
+    LikePostRequest,
+    ListPostsRequest,
+    CreateCommentRequest,
+    GetCommentRequest,
+    DeleteCommentRequest,
+    ListCommentsRequest,
+    ListPostCommentsRequest,
+    ListCommentsForPostsRequest,
+)
+decoders.warm(Post, Comment)
+json_serializers.warm(Post, Comment)
+
+
+def query_params(event: LambdaEvent, *list_params: str) -> Dict[str, Any]:
+    """Query string parameters, with the comma separated `list_params` split into lists"""
+    params: Dict[str, Any] = dict(event.get("queryStringParameters") or {})
+    for name in list_params:
+        if name in params:
+            params[name] = [value for value in params[name].split(",") if value]
+    return params
+
+
+def page_headers(page: Page) -> Dict[str, str]:
+    return {"X-Next-Cursor": page.cursor} if page.cursor else {}
+
+
+def last_modified_headers(post: PostView) -> Dict[str, str]:
+    if isinstance(post, Sparse):
+        modified = post.values.get("updated_at") or post.values.get("created_at")
+    else:
+        modified = post.last_modified
+    # Timestamps are naive UTC
+    return {"Last-Modified": format_datetime(modified.replace(tzinfo=timezone.utc), usegmt=True)} if modified else {}
 
 
 @serverless
@@ -35,7 +93,7 @@ def create_post(event: LambdaEvent, context: LambdaContext, service: IPostServic
 
     return {
         "statusCode": 200,
-        "body": json.dumps(asdict(result), cls=JSONEncoder),
+        "body": to_json(result),
     }
 
 
@@ -45,12 +103,14 @@ def read_post(event: LambdaEvent, context: LambdaContext, service: IPostService,
     logger.debug(event)
     logger.debug(context)
 
-    request = validate_and_get_dataclass(event.get("pathParameters") or {}, GetPostRequest)
+    params = {**query_params(event, "fields"), **(event.get("pathParameters") or {})}
+    request = validate_and_get_dataclass(params, GetPostRequest)
     result = service.read(request)
 
     return {
         "statusCode": 200,
-        "body": json.dumps(asdict(result), cls=JSONEncoder),
+        "headers": last_modified_headers(result),
+        "body": to_json(result),
     }
 
 
@@ -60,11 +120,13 @@ def list_posts(event: LambdaEvent, context: LambdaContext, service: IPostService
     logger.debug(event)
     logger.debug(context)
 
-    result = service.list_reversed()
+    request = validate_and_get_dataclass(query_params(event, "fields"), ListPostsRequest)
+    page = service.list_reversed(request)
 
     return {
         "statusCode": 200,
-        "body": json.dumps([asdict(post) for post in result], cls=JSONEncoder),
+        "headers": page_headers(page),
+        "body": to_json_many(page.items),
     }
 
 
@@ -79,7 +141,45 @@ def update_image(event: LambdaEvent, context: LambdaContext, service: IPostServi
     is_base64_encoded = event["isBase64Encoded"]
     request = UpdateImageRequest(post_id, body, is_base64_encoded)
     resource = service.update_logo(request)
-    return {"statusCode": 200, "body": json.dumps(asdict(resource), cls=JSONEncoder)}
+    return {"statusCode": 200, "body": to_json(resource)}
+
+
+@serverless
+@inject
+def create_image_upload(
+    event: LambdaEvent, context: LambdaContext, service: IPostService, logger: Logger
+) -> LambdaResponse:
+    logger.debug(event)
+    logger.debug(context)
+
+    params = {**json.loads(event.get("body") or "{}"), **(event.get("pathParameters") or {})}
+    request = validate_and_get_dataclass(params, CreateImageUploadRequest)
+    result = service.create_logo_upload(request)
+
+    return {
+        "statusCode": 200,
+        "body": to_json(result),
+    }
+
+
+@inject
+def image_uploaded(event: LambdaEvent, context: LambdaContext, service: IPostService, logger: Logger) -> None:
+    logger.debug(event)
+    logger.debug(context)
+
+    for record in event["Records"]:
+        key = unquote_plus(record["s3"]["object"]["key"])
+        folder, _, name = key.partition("/")
+        if folder != "posts" or "/" in name:
+            logger.debug(f"Ignoring {key}, it is not an uploaded post image")
+            continue
+        try:
+            post_id = uuid.UUID(name)
+            service.attach_uploaded_logo(post_id)
+        except (ValueError, ImageError, RecordNotFound) as e:
+            logger.warning(f"Image {key} was not attached: {e}")
+            continue
+        logger.info(f"Image {key} attached to post {post_id}")
 
 
 @serverless
@@ -95,7 +195,7 @@ def create_comment(
 
     return {
         "statusCode": 200,
-        "body": json.dumps(asdict(result), cls=JSONEncoder),
+        "body": to_json(result),
     }
 
 
@@ -116,15 +216,62 @@ def delete_comment(
     }
 
 
+def record_message(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Event carried by an SNS record, or by an SQS record with or without the SNS envelope (raw delivery)"""
+    if "Sns" in record:
+        return json.loads(record["Sns"]["Message"])
+    body = json.loads(record["body"])
+    if body.get("Type") == "Notification" and "Message" in body:
+        return json.loads(body["Message"])
+    return body
+
+
+def record_id(record: Dict[str, Any]) -> str:
+    return record["messageId"] if "messageId" in record else record.get("Sns", {}).get("MessageId", "")
+
+
 @inject
-def admin_notify(event: LambdaEvent, context: LambdaContext, service: ICommentService, logger: Logger) -> None:
+def admin_notify(
+    event: LambdaEvent, context: LambdaContext, service: ICommentService, logger: Logger
+) -> Optional[LambdaResponse]:
+    """Notifies every record of the batch, delivered by SNS or by an SQS queue subscribed to the topic.
+
+    Malformed records are logged and dropped, since delivering them again cannot fix them. For SQS the records
+    that failed otherwise are reported as `batchItemFailures`, so only those come back; for SNS the first error
+    is raised once the whole batch was tried, and Lambda retries the invocation.
+    """
     logger.debug(event)
     logger.debug(context)
-    message = json.loads(event["Records"][0]["Sns"]["Message"])
-    request = validate_and_get_dataclass(message, Event)
 
-    service.notify(request)
-    logger.info("Message sent successfully")
+    failures: List[Dict[str, str]] = []
+    error: Optional[Exception] = None
+    for record in event["Records"]:
+        try:
+            request = validate_and_get_dataclass(record_message(record), Event)
+            service.notify(request)
+        except (KeyError, ValueError, ValidationError) as e:
+            logger.error(f"Dropping malformed message {record_id(record)}: {e}")
+        except Exception as e:
+            logger.exception(f"Message {record_id(record)} was not sent")
+            failures.append({"itemIdentifier": record_id(record)})
+            error = error or e
+        else:
+            logger.info(f"Message {record_id(record)} sent successfully")
+
+    if event["Records"] and event["Records"][0].get("eventSource") == "aws:sqs":
+        return {"batchItemFailures": failures}
+    if error:
+        raise error
+    return None
+
+
+@inject
+def flush_admin_digest(event: LambdaEvent, context: LambdaContext, service: ICommentService, logger: Logger) -> None:
+    logger.debug(event)
+    logger.debug(context)
+
+    count = service.flush_digest()
+    logger.info(f"Sent the admin digest with {count} deleted comments")
 
 
 @serverless
@@ -140,7 +287,7 @@ def read_comment(
 
     return {
         "statusCode": 200,
-        "body": json.dumps(asdict(result), cls=JSONEncoder),
+        "body": to_json(result),
     }
 
 
@@ -152,11 +299,49 @@ def list_comments(
     logger.debug(event)
     logger.debug(context)
 
-    result = service.list_reversed()
+    request = validate_and_get_dataclass(event.get("queryStringParameters") or {}, ListCommentsRequest)
+    page = service.list_reversed(request)
+
+    return {
+        "statusCode": 200,
+        "headers": page_headers(page),
+        "body": to_json_many(page.items),
+    }
+
+
+@serverless
+@inject
+def list_post_comments(
+    event: LambdaEvent, context: LambdaContext, service: ICommentService, logger: Logger
+) -> LambdaResponse:
+    logger.debug(event)
+    logger.debug(context)
+
+    params = {**(event.get("queryStringParameters") or {}), "post_id": (event.get("pathParameters") or {}).get("id")}
+    request = validate_and_get_dataclass(params, ListPostCommentsRequest)
+    page = service.list_for_post(request)
+
+    return {
+        "statusCode": 200,
+        "headers": page_headers(page),
+        "body": to_json_many(page.items),
+    }
+
+
+@serverless
+@inject
+def list_comments_for_posts(
+    event: LambdaEvent, context: LambdaContext, service: ICommentService, logger: Logger
+) -> LambdaResponse:
+    logger.debug(event)
+    logger.debug(context)
+
+    request = validate_and_get_dataclass(query_params(event, "post_ids"), ListCommentsForPostsRequest)
+    result = service.list_for_posts(request)
 
     return {
         "statusCode": 200,
-        "body": json.dumps([asdict(comment) for comment in result], cls=JSONEncoder),
+        "body": to_json_grouped(result),
     }
 
 
@@ -171,5 +356,23 @@ def like_comment(event: LambdaEvent, context: LambdaContext, service: IPostServi
 
     return {
         "statusCode": 200,
-        "body": json.dumps(asdict(result), cls=JSONEncoder),
+        "body": to_json(result),
     }
+
+
+@inject
+def compact_likes(event: LambdaEvent, context: LambdaContext, service: IPostService, logger: Logger) -> None:
+    logger.debug(event)
+    logger.debug(context)
+
+    moved = service.compact_likes()
+    logger.info(f"Compacted {moved} likes from like shards")
+
+
+@inject
+def rebuild_feed_snapshot(event: LambdaEvent, context: LambdaContext, service: IPostService, logger: Logger) -> None:
+    logger.debug(event)
+    logger.debug(context)
+
+    count = service.rebuild_feed_snapshot()
+    logger.info(f"Rebuilt the feed snapshot with {count} posts")
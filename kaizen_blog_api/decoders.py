@@ -0,0 +1,83 @@
+import uuid
+from dataclasses import is_dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Sequence, Type, TypeVar, cast
+
+from kaizen_blog_api.serializers import (
+    CompiledRegistry,
+    Converter,
+    Sparse,
+    identity,
+    optional_converter,
+    resolve_fields,
+)
+
+T = TypeVar("T")
+
+
+def _to_datetime(value: Any) -> datetime:
+    if isinstance(value, Decimal):
+        return datetime.fromtimestamp(float(value))
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+class TrustedDecoder:
+    """Builds a dataclass straight from an item read back from our own tables.
+
+    Items written by the repositories are already well-formed, so only the type conversions done
+    by the schema fields are kept: no validation, no unknown field checks.
+    """
+
+    def __init__(self, dataclass: type, registry: "DecoderRegistry"):
+        self._dataclass = dataclass
+        self._fields = []
+        for name, field_type, optional in resolve_fields(dataclass):
+            converter = self._converter(field_type, registry)
+            self._fields.append((name, optional_converter(converter) if optional else converter))
+        self._converters = dict(self._fields)
+
+    @staticmethod
+    def _converter(field_type: Any, registry: "DecoderRegistry") -> Converter:
+        if field_type is uuid.UUID:
+            return uuid.UUID
+        if field_type is datetime:
+            return _to_datetime
+        if field_type is int:
+            return int
+        if isinstance(field_type, type) and is_dataclass(field_type):
+            return registry.get(field_type)
+        return identity
+
+    def __call__(self, item: Dict[str, Any]) -> Any:
+        return self._dataclass(**{name: convert(item[name]) for name, convert in self._fields if name in item})
+
+    def sparse(self, item: Dict[str, Any], fields: Sequence[str]) -> Sparse:
+        values = {name: self._converters[name](item[name]) for name in fields if name in item}
+        return Sparse(self._dataclass, fields, values)
+
+
+class DecoderRegistry(CompiledRegistry[TrustedDecoder]):
+    def _compile(self, dataclass: type) -> TrustedDecoder:
+        return TrustedDecoder(dataclass, self)
+
+    def load(self, item: Dict[str, Any], dataclass: Type[T]) -> T:
+        return cast(T, self.get(dataclass)(item))
+
+    def load_many(self, items: Iterable[Dict[str, Any]], dataclass: Type[T]) -> List[T]:
+        decode = self.get(dataclass)
+        return [decode(item) for item in items]
+
+    def load_sparse(self, item: Dict[str, Any], dataclass: Type[T], fields: Sequence[str]) -> Sparse[T]:
+        return self.get(dataclass).sparse(item, fields)
+
+    def load_sparse_many(
+        self, items: Iterable[Dict[str, Any]], dataclass: Type[T], fields: Sequence[str]
+    ) -> List[Sparse[T]]:
+        decoder = self.get(dataclass)
+        return [decoder.sparse(item, fields) for item in items]
+
+
+decoders = DecoderRegistry()
@@ -20,3 +20,11 @@ class RecordNotFound(ApiError):
 
 class ImageError(ApiError):
     status_code = 415
+
+
+class ConflictError(ApiError):
+    status_code = 409
+
+
+class TruncatedImageError(ImageError):
+    """The header ended before the format and dimensions of the image could be read"""
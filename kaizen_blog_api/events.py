@@ -1,9 +1,8 @@
-import json
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from enum import Enum
 
 from kaizen_blog_api.comment.entities import Comment
-from kaizen_blog_api.serializers import JSONEncoder
+from kaizen_blog_api.serializers import to_json
 
 
 @dataclass
@@ -27,5 +26,5 @@ class CommentDeletedEvent(Event):
         super().__init__(
             str(comment.id),
             str(EventName.COMMENT_DELETED),
-            json.dumps(asdict(comment), cls=JSONEncoder),
+            to_json(comment),
         )
@@ -0,0 +1,77 @@
+"""Backfills for existing rows.
+
+    poetry run python -m kaizen_blog_api.migrations [table ...]
+
+The by_feed GSI (HASH feed_bucket S, RANGE created_at N, projection ALL) only indexes items that carry
+a feed_bucket, so rows written before it existed have to be backfilled once it is created. The oldest
+bucket of each table is recorded too, so feed reads stop walking back there instead of at FEED_EPOCH.
+"""
+import sys
+from datetime import datetime
+from logging import Logger
+from typing import Any, Dict, Optional
+
+from boto3.dynamodb import conditions
+from botocore.exceptions import ClientError
+from kink import di
+
+from kaizen_blog_api.common import FEED_BUCKET, feed_bucket, note_feed_bucket
+
+
+def backfill_feed_buckets(table: Any, logger: Logger) -> int:
+    kwargs: Dict[str, Any] = {
+        "ProjectionExpression": "id, created_at",
+        "FilterExpression": conditions.Attr(FEED_BUCKET).not_exists() & conditions.Attr("created_at").exists(),
+    }
+    updated = 0
+    while True:
+        result = table.scan(**kwargs)
+        for item in result["Items"]:
+            bucket = feed_bucket(datetime.fromtimestamp(float(item["created_at"])))
+            try:
+                table.update_item(
+                    Key={"id": item["id"]},
+                    UpdateExpression="SET #bucket = :bucket",
+                    ConditionExpression="attribute_exists(id)",
+                    ExpressionAttributeNames={"#bucket": FEED_BUCKET},
+                    ExpressionAttributeValues={":bucket": bucket},
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                continue
+            updated += 1
+        if "LastEvaluatedKey" not in result:
+            break
+        kwargs["ExclusiveStartKey"] = result["LastEvaluatedKey"]
+
+    logger.info(f"Backfilled {updated} items of {table.name} with {FEED_BUCKET}")
+    return updated
+
+
+def record_oldest_feed_bucket(table: Any, logger: Logger) -> None:
+    """Records the oldest bucket of the rows already in the table, so feed reads stop there"""
+    kwargs: Dict[str, Any] = {
+        "ProjectionExpression": "#bucket",
+        "FilterExpression": conditions.Attr(FEED_BUCKET).exists(),
+        "ExpressionAttributeNames": {"#bucket": FEED_BUCKET},
+    }
+    oldest: Optional[str] = None
+    while True:
+        result = table.scan(**kwargs)
+        for item in result["Items"]:
+            if oldest is None or item[FEED_BUCKET] < oldest:
+                oldest = item[FEED_BUCKET]
+        if "LastEvaluatedKey" not in result:
+            break
+        kwargs["ExclusiveStartKey"] = result["LastEvaluatedKey"]
+    if oldest:
+        note_feed_bucket(table, oldest)
+    logger.info(f"Recorded the oldest {FEED_BUCKET} of {table.name}: {oldest}")
+
+
+if __name__ == "__main__":
+    tables = [di["dynamo_db"].Table(name) for name in sys.argv[1:]] or [di["posts_table"], di["comments_table"]]
+    for table in tables:
+        backfill_feed_buckets(table, di[Logger])
+        record_oldest_feed_bucket(table, di[Logger])
@@ -0,0 +1,115 @@
+import random
+import time
+import uuid
+import weakref
+from logging import Logger
+from typing import Any, Dict, List, Optional
+
+from botocore.client import BaseClient
+from botocore.exceptions import BotoCoreError, ClientError
+
+PUBLISH_BATCH_MAX_ENTRIES = 10
+PUBLISH_MAX_ATTEMPTS = 3
+PUBLISH_BACKOFF = 0.05
+
+_outboxes: "weakref.WeakSet[EventOutbox]" = weakref.WeakSet()
+
+
+class EventOutbox:
+    """Messages for an SNS topic, queued during an invocation and published with PublishBatch when it ends.
+
+    Entries that SNS fails on its side, or whole calls that fail, are retried with exponential backoff up to
+    `max_attempts` times; entries it rejects as malformed are not. Whatever is still unsent is logged and dropped.
+    Sent, retried and failed counters are logged after every flush.
+    """
+
+    def __init__(
+        self,
+        sns_client: BaseClient,
+        topic_arn: str,
+        logger: Optional[Logger] = None,
+        max_attempts: int = PUBLISH_MAX_ATTEMPTS,
+        backoff: float = PUBLISH_BACKOFF,
+    ) -> None:
+        self._sns = sns_client
+        self._topic_arn = topic_arn
+        self._logger = logger
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._pending: List[Dict[str, Any]] = []
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        _outboxes.add(self)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, message: str, attributes: Optional[Dict[str, Any]] = None, structure: Optional[str] = None) -> None:
+        entry: Dict[str, Any] = {"Id": uuid.uuid4().hex, "Message": message}
+        if attributes:
+            entry["MessageAttributes"] = attributes
+        if structure:
+            entry["MessageStructure"] = structure
+        self._pending.append(entry)
+
+    def flush(self) -> int:
+        """Publishes every queued message. Returns the number sent; failures are counted, never raised"""
+        pending, self._pending = self._pending, []
+        sent = 0
+        for start in range(0, len(pending), PUBLISH_BATCH_MAX_ENTRIES):
+            sent += self._publish(pending[start : start + PUBLISH_BATCH_MAX_ENTRIES])  # noqa: E203
+        if pending:
+            self.log_stats()
+        return sent
+
+    def _publish(self, batch: List[Dict[str, Any]]) -> int:
+        sent, error = 0, ""
+        for attempt in range(self._max_attempts):
+            if attempt:
+                self.retried += len(batch)
+                time.sleep(random.uniform(0, self._backoff * 2 ** attempt))
+            try:
+                result = self._sns.publish_batch(TopicArn=self._topic_arn, PublishBatchRequestEntries=batch)
+            except ClientError as e:
+                error = e.response["Error"]["Code"]
+                continue
+            except BotoCoreError as e:
+                error = type(e).__name__
+                continue
+
+            sent += len(result.get("Successful", []))
+            failed = {entry["Id"]: entry for entry in result.get("Failed", [])}
+            rejected = [entry for entry in batch if failed.get(entry["Id"], {}).get("SenderFault")]
+            self._drop(rejected, "rejected by SNS")
+            batch = [entry for entry in batch if entry["Id"] in failed and entry not in rejected]
+            if not batch:
+                break
+            error = ", ".join(sorted({failed[entry["Id"]]["Code"] for entry in batch}))
+        else:
+            self._drop(batch, f"not sent after {self._max_attempts} attempts ({error})")
+        self.sent += sent
+        return sent
+
+    def _drop(self, entries: List[Dict[str, Any]], reason: str) -> None:
+        if not entries:
+            return
+        self.failed += len(entries)
+        if self._logger:
+            for entry in entries:
+                self._logger.error(f"Message {entry['Id']} {reason}: {entry['Message']}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed, "pending": len(self._pending)}
+
+    def log_stats(self) -> None:
+        if self._logger:
+            counters = " ".join(f"{name}={value}" for name, value in self.stats().items())
+            self._logger.info(f"outbox {counters}")
+
+
+def flush_outboxes() -> None:
+    """Sends whatever every outbox queued during the invocation, before Lambda freezes the container"""
+    for outbox in list(_outboxes):
+        if len(outbox):
+            outbox.flush()
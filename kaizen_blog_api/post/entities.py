@@ -1,26 +1,42 @@
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
 from kaizen_blog_api.errors import ValidationError
+from kaizen_blog_api.tracking import DirtyTracking
 
 
 @dataclass
 class Image:
     id: uuid.UUID
     url: str
+    # Resized derivatives by name ("thumbnail", "feed.webp"...), see kaizen_blog_api.post.images
+    variants: Dict[str, str] = field(default_factory=dict)
 
 
 @dataclass
-class Post:
+class ImageUpload:
+    url: str
+    fields: Dict[str, str]
+
+
+@dataclass
+class Post(DirtyTracking):
     id: uuid.UUID
     text: str
     username: str
     image: Optional[Image] = None
     likes: int = 0
     created_at: datetime = field(default_factory=datetime.utcnow)
+    version: int = 0
+    updated_at: Optional[datetime] = None
+
+    @property
+    def last_modified(self) -> datetime:
+        return self.updated_at or self.created_at
 
     def __post_init__(self) -> None:
         if self.image and self.image.id != self.id:
             raise ValidationError("Image and post should have same ID")
+        self.mark_clean()
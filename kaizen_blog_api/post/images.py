@@ -0,0 +1,98 @@
+"""Resized derivatives of post images, in their own format and in WebP."""
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BufferedReader, BytesIO
+from typing import Dict, List, Optional, Tuple, Union
+
+from PIL import Image as ImageProcess
+
+from kaizen_blog_api import IMAGE_VARIANT_WORKERS
+from kaizen_blog_api.errors import ImageError
+from kaizen_blog_api.post.ingest import ViewReader
+
+# Variant name and the largest width it is rendered at. Images are never enlarged
+VARIANT_WIDTHS: Dict[str, int] = {"thumbnail": 160, "feed": 640, "full": 1600}
+WEBP_SUFFIX = ".webp"
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+# Pillow 9.1 moved the filters to Image.Resampling; the 8.x releases pyproject allows only have the module constant
+LANCZOS: int = getattr(ImageProcess, "Resampling", ImageProcess).LANCZOS
+
+CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+_executor: Optional[Executor] = None
+
+
+@dataclass
+class Derivative:
+    name: str
+    content_type: str
+    data: bytes
+
+
+def variant_names() -> List[str]:
+    return [name + suffix for name in VARIANT_WIDTHS for suffix in ("", WEBP_SUFFIX)]
+
+
+def _load_scaled(data: Union[bytes, memoryview], width: int) -> Tuple[ImageProcess.Image, str]:
+    """Decodes the image at the smallest scale that is still at least `width` wide, with its source format.
+
+    JPEG decoders can scale by 1/2, 1/4 or 1/8 while decoding (`draft`); for other formats `reduce` shrinks by
+    an integer factor with a box filter, which is much cheaper than resampling from full size.
+    """
+    img: ImageProcess.Image = ImageProcess.open(BufferedReader(ViewReader(memoryview(data))))
+    source_format = img.format
+    if source_format is None:
+        raise ImageError("Unrecognizable image format.")
+    if source_format == "JPEG":
+        img.draft("RGB", (width, width * img.height // img.width))
+    if img.mode not in ("L", "LA", "RGB", "RGBA"):
+        img = img.convert("RGBA")
+    factor = img.width // width
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img, source_format
+
+
+def render_variant(data: Union[bytes, memoryview], name: str, width: int) -> List[Derivative]:
+    """`name` resized to `width`, in the source format (JPEG, otherwise PNG) and in WebP"""
+    img, source_format = _load_scaled(data, width)
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), LANCZOS)
+
+    if source_format == "JPEG":
+        outputs = [("", img.convert("RGB"), "JPEG", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True})]
+    else:
+        outputs = [("", img, "PNG", {})]
+    outputs.append((WEBP_SUFFIX, img, "WEBP", {"quality": WEBP_QUALITY}))
+
+    derivatives = []
+    for suffix, image, image_format, options in outputs:
+        out = BytesIO()
+        image.save(out, image_format, **options)
+        derivatives.append(Derivative(name + suffix, CONTENT_TYPES[image_format], out.getvalue()))
+    return derivatives
+
+
+def _executor_for_variants() -> Executor:
+    """Process pool kept for the life of the container. Lambda has no /dev/shm, which process pools need for
+    their locks, so there it falls back to threads; Pillow releases the GIL while resizing and encoding.
+    """
+    global _executor
+    if _executor is None:
+        try:
+            _executor = ProcessPoolExecutor(max_workers=IMAGE_VARIANT_WORKERS or os.cpu_count())
+        except (OSError, NotImplementedError):
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_VARIANT_WORKERS or os.cpu_count())
+    return _executor
+
+
+def render_variants(data: Union[bytes, memoryview], executor: Optional[Executor] = None) -> List[Derivative]:
+    """Every variant of the image, rendered in parallel. Threads share `data`, processes get a copy of it"""
+    pool = executor or _executor_for_variants()
+    if isinstance(pool, ProcessPoolExecutor) and not isinstance(data, bytes):
+        data = bytes(data)
+    futures = [pool.submit(render_variant, data, name, width) for name, width in VARIANT_WIDTHS.items()]
+    return [derivative for future in futures for derivative in future.result()]
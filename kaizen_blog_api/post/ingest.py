@@ -0,0 +1,196 @@
+"""Image ingest without copies: base64 is decoded into one reusable buffer and the image is only ever handled
+through memoryviews of it. Format and dimensions are read from the header bytes, so oversized images and
+decompression bombs are rejected before anything decodes them.
+"""
+import binascii
+import io
+import re
+import struct
+from dataclasses import dataclass
+from typing import Any, Optional, Union
+
+from kaizen_blog_api import IMAGE_MAX_PIXELS, IMAGE_UPLOAD_MAX_SIZE
+from kaizen_blog_api.errors import ImageError, TruncatedImageError
+
+# Multiple of 4, so every chunk is whole base64 quanta
+BASE64_CHUNK = 64 * 1024
+DATA_URL_MARKER = "base64,"
+# MIME encoders wrap base64 in 76 character lines
+BASE64_WHITESPACE = re.compile(r"\s+")
+BASE64_WHITESPACE_BYTES = re.compile(rb"\s+")
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+_buffer = bytearray()
+
+
+@dataclass
+class ImageInfo:
+    format: str
+    width: int
+    height: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+def _decode_base64(encoded: Union[str, bytes], start: int = 0) -> memoryview:
+    """Decodes `encoded[start:]` into the module buffer, which is grown when needed and reused between calls.
+
+    The view is only valid until the next call, which is fine for Lambda since it runs one request at a time.
+    """
+    global _buffer
+    if isinstance(encoded, str):
+        if BASE64_WHITESPACE.search(encoded, start):
+            # Line breaks would shift the chunks off whole quanta, so they go, at the cost of one copy
+            encoded, start = BASE64_WHITESPACE.sub("", encoded[start:]), 0
+    elif BASE64_WHITESPACE_BYTES.search(encoded, start):
+        encoded, start = BASE64_WHITESPACE_BYTES.sub(b"", encoded[start:]), 0
+    source = memoryview(encoded) if isinstance(encoded, bytes) else encoded
+    capacity = (len(source) - start) * 3 // 4
+    # Padding makes the capacity at most 2 bytes larger than the decoded image
+    if capacity > IMAGE_UPLOAD_MAX_SIZE + 2:
+        raise ImageError("Image too large.")
+    if len(_buffer) < capacity:
+        _buffer = bytearray(capacity)
+
+    size = 0
+    try:
+        for chunk_start in range(start, len(source), BASE64_CHUNK):
+            decoded = binascii.a2b_base64(source[chunk_start : chunk_start + BASE64_CHUNK])  # noqa: E203
+            _buffer[size : size + len(decoded)] = decoded  # noqa: E203
+            size += len(decoded)
+    except (binascii.Error, ValueError):
+        raise ImageError("Invalid image file")
+    return memoryview(_buffer)[:size]
+
+
+def decode_image(image: Union[str, bytes], is_base64_encoded: bool) -> memoryview:
+    """Raw bytes of an image sent base64 encoded by API Gateway, or as a data URL in a text body"""
+    if is_base64_encoded:
+        return _decode_base64(image)
+    if isinstance(image, str):
+        marker = image.find(DATA_URL_MARKER)
+    else:
+        marker = image.find(DATA_URL_MARKER.encode())
+    if marker <= 0:
+        raise ImageError("Invalid image file")
+    return _decode_base64(image, marker + len(DATA_URL_MARKER))
+
+
+def _png(header: memoryview) -> Optional[ImageInfo]:
+    if header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack_from(">II", header, 16)
+    return ImageInfo("PNG", width, height)
+
+
+def _gif(header: memoryview) -> Optional[ImageInfo]:
+    if header[:6] not in (b"GIF87a", b"GIF89a"):
+        return None
+    width, height = struct.unpack_from("<HH", header, 6)
+    return ImageInfo("GIF", width, height)
+
+
+def _jpeg(header: memoryview) -> Optional[ImageInfo]:
+    """Walks the marker segments, jumping over their payloads, up to the frame header"""
+    if header[:2] != b"\xff\xd8":
+        return None
+    position = 2
+    while position + 9 <= len(header):
+        if header[position] != 0xFF:
+            return None
+        marker = header[position + 1]
+        if marker == 0xFF:
+            position += 1
+        elif marker in JPEG_STANDALONE_MARKERS:
+            position += 2
+        elif marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack_from(">HH", header, position + 5)
+            return ImageInfo("JPEG", width, height)
+        else:
+            (length,) = struct.unpack_from(">H", header, position + 2)
+            position += 2 + length
+    # EXIF and ICC profile segments can push the frame header anywhere
+    raise TruncatedImageError("Unrecognizable image format.")
+
+
+def _webp(header: memoryview) -> Optional[ImageInfo]:
+    if header[:4] != b"RIFF" or header[8:12] != b"WEBP" or len(header) < 30:
+        return None
+    chunk = bytes(header[12:16])
+    if chunk == b"VP8 ":
+        width, height = struct.unpack_from("<HH", header, 26)
+        return ImageInfo("WEBP", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L":
+        (bits,) = struct.unpack_from("<I", header, 21)
+        return ImageInfo("WEBP", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X":
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return ImageInfo("WEBP", width, height)
+    return None
+
+
+def sniff(header: Union[bytes, memoryview]) -> ImageInfo:
+    """Format and dimensions of a GIF, JPEG, PNG or WebP image, read from its first bytes only.
+
+    Raises `TruncatedImageError` when the header ends before they could be read, so more of it can be fetched.
+    """
+    view = memoryview(header)
+    try:
+        for parse in (_png, _gif, _jpeg, _webp):
+            info = parse(view)
+            if info:
+                return info
+    except (struct.error, IndexError):
+        raise TruncatedImageError("Unrecognizable image format.")
+    raise ImageError("Unrecognizable image format.")
+
+
+def check_image(header: Union[bytes, memoryview], size: int) -> ImageInfo:
+    """Sniffs the image and rejects it if it is too large to upload or too large to decode"""
+    if size > IMAGE_UPLOAD_MAX_SIZE:
+        raise ImageError("Image too large.")
+    info = sniff(header)
+    if not info.pixels or info.pixels > IMAGE_MAX_PIXELS:
+        raise ImageError(f"Images must have at most {IMAGE_MAX_PIXELS} pixels.")
+    return info
+
+
+class ViewReader(io.RawIOBase):
+    """Seekable file object over a memoryview, so boto3 and Pillow read the image without copying it first"""
+
+    def __init__(self, view: memoryview) -> None:
+        self._view = view.cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        # RawIOBase.read allocates `size` bytes up front, however little is left
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        data = bytes(self._view[self._position : end])  # noqa: E203
+        self._position = max(self._position, end)
+        return data
+
+    def readinto(self, buffer: Any) -> int:
+        size = max(0, min(len(buffer), len(self._view) - self._position))
+        buffer[:size] = self._view[self._position : self._position + size]  # noqa: E203
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
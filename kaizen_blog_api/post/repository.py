@@ -1,18 +1,65 @@
+import hashlib
+import random
 import uuid
-from dataclasses import asdict
-from io import BytesIO
-from typing import Iterable, Protocol, runtime_checkable
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Sequence, Tuple, Union, runtime_checkable
 
+from boto3.dynamodb import conditions
 from botocore.client import BaseClient
 from botocore.exceptions import ClientError
 from kink import inject
-from PIL import Image as ImageProcess, UnidentifiedImageError
 
-from kaizen_blog_api.common import get_record
-from kaizen_blog_api.errors import AWSError, ImageError, RepositoryError
+from kaizen_blog_api import IMAGE_UPLOAD_EXPIRES, IMAGE_UPLOAD_MAX_SIZE
+from kaizen_blog_api.cache import RecordCache
+from kaizen_blog_api.common import (
+    FeedBucketMarker,
+    Page,
+    batch_get_items,
+    feed_bucket,
+    feed_cursor,
+    get_item,
+    get_record,
+    get_records,
+    get_sparse_record,
+    is_condition_failure,
+    query_feed,
+    to_feed_item,
+)
+from kaizen_blog_api.decoders import decoders
+from kaizen_blog_api.errors import AWSError, ConflictError, ImageError, RecordNotFound, TruncatedImageError
 from kaizen_blog_api.post.entities import Image, Post
-from kaizen_blog_api.serializers import dict_factory
-from kaizen_blog_api.validators import validate_and_get_dataclass
+from kaizen_blog_api.post.images import Derivative, render_variants, variant_names
+from kaizen_blog_api.post.ingest import ImageInfo, ViewReader, check_image
+from kaizen_blog_api.serializers import Sparse, to_item
+
+LIKE_SHARD_SEPARATOR = "#likes#"
+# Single item holding the newest posts, newest first. It has no feed_bucket, so it stays out of the feed index
+FEED_SNAPSHOT_ID = "feed#latest"
+FEED_SNAPSHOT_MAX_ATTEMPTS = 3
+
+IMAGE_CONTENT_TYPES = {"image/gif": "GIF", "image/jpeg": "JPEG", "image/png": "PNG", "image/webp": "WEBP"}
+IMAGE_FORMAT_CONTENT_TYPES = {image_format: content_type for content_type, image_format in IMAGE_CONTENT_TYPES.items()}
+# Enough to read the format and size of any of them, JPEG EXIF blocks included
+IMAGE_HEADER_BYTES = 64 * 1024
+IMAGE_READ_CHUNK = 1024 * 1024
+# Images are stored under their SHA-256, so whatever is at a key never changes
+IMAGE_PREFIX = "images"
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+PostView = Union[Post, Sparse[Post]]
+
+
+def utc_timestamp() -> Decimal:
+    return Decimal(datetime.utcnow().timestamp())
+
+
+def image_key(digest: str, image_format: str) -> str:
+    return f"{IMAGE_PREFIX}/{digest}.{image_format.lower()}"
+
+
+def variant_key(digest: str, name: str) -> str:
+    return f"{IMAGE_PREFIX}/{digest}/{name}"
 
 
 @runtime_checkable
@@ -20,78 +67,565 @@ class IPostRepository(Protocol):
     def insert(self, post: Post) -> None:
         ...
 
-    def get(self, post_id: uuid.UUID) -> Post:
+    def get(self, post_id: uuid.UUID, consistent_read: bool = False) -> Post:
+        ...
+
+    def get_many(self, post_ids: Iterable[uuid.UUID], consistent_read: bool = False) -> List[Post]:
+        ...
+
+    def get_sparse(self, post_id: uuid.UUID, fields: Sequence[str]) -> Sparse[Post]:
+        ...
+
+    def list_by_date_reversed(
+        self, limit: int, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> Page[PostView]:
+        ...
+
+    def upload(self, image: Union[bytes, memoryview], key: uuid.UUID) -> Image:
+        ...
+
+    def presign_upload(self, key: uuid.UUID, content_type: str) -> Dict[str, Any]:
+        ...
+
+    def inspect_upload(self, key: uuid.UUID) -> ImageInfo:
+        ...
+
+    def store_upload(self, key: uuid.UUID, info: ImageInfo) -> Image:
+        ...
+
+    def update(self, post: Post = None, post_id: uuid.UUID = None, check_version: bool = False) -> None:
+        ...
+
+    def set_image(self, post_id: uuid.UUID, image: Image) -> Post:
+        ...
+
+    def increment_likes(self, post_id: uuid.UUID) -> Post:
+        ...
+
+    def compact_likes(self) -> int:
+        ...
+
+    def get_feed_snapshot(self, limit: int, fields: Optional[Sequence[str]] = None) -> Optional[Page[PostView]]:
         ...
 
-    def list_by_date_reversed(self) -> Iterable[Post]:
+    def update_feed_snapshot(self, post: Post) -> None:
         ...
 
-    def upload(self, image: bytes, key: uuid.UUID) -> Image:
+    def like_in_feed_snapshot(self, post_id: uuid.UUID) -> None:
         ...
 
-    def update(self, post: Post = None, post_id: uuid.UUID = None) -> None:
+    def rebuild_feed_snapshot(self) -> int:
         ...
 
 
 @inject(alias=IPostRepository)
 class PostRepository(IPostRepository):
-    def __init__(self, posts_table: BaseClient, bucket_name: str, s3_client: BaseClient) -> None:
+    def __init__(
+        self,
+        posts_table: BaseClient,
+        bucket_name: str,
+        s3_client: BaseClient,
+        like_shards: int = 0,
+        posts_cache: Optional[RecordCache[Post]] = None,
+        feed_snapshot_size: int = 0,
+    ) -> None:
         self.table = posts_table
         self._s3_client = s3_client
         self._bucket_name = bucket_name
+        self._like_shards = like_shards
+        self._cache = posts_cache if posts_cache is not None else RecordCache("posts")
+        self._feed_snapshot_size = feed_snapshot_size
+        self._feed_buckets = FeedBucketMarker(posts_table)
 
     def insert(self, post: Post) -> None:
+        self._feed_buckets.note(feed_bucket(post.created_at))
         try:
-            self.table.put_item(Item=asdict(post, dict_factory=dict_factory))
+            self.table.put_item(Item=to_feed_item(post))
         except ClientError as e:
             raise AWSError(f"AWS error {e.response['Error']['Code']} inserting {str(post.id)}") from e
 
-    def get(self, post_id: uuid.UUID) -> Post:
-        return get_record(post_id, Post, self.table)
+    def get(self, post_id: uuid.UUID, consistent_read: bool = False) -> Post:
+        cached = None if consistent_read else self._cache.get(post_id)
+        if cached is not None:
+            return cached
+
+        if self._like_shards:
+            post = self._get_with_shards(post_id, consistent_read)
+        else:
+            post = get_record(post_id, Post, self.table, consistent_read)
+        self._cache.put(post_id, post)
+        return post
+
+    def get_many(self, post_ids: Iterable[uuid.UUID], consistent_read: bool = False) -> List[Post]:
+        if not self._like_shards:
+            return get_records(post_ids, Post, self.table, consistent_read)
+
+        ids = list(dict.fromkeys(str(post_id) for post_id in post_ids))
+        keys = [{"id": post_id} for post_id in ids]
+        keys += [{"id": self._shard_id(post_id, shard)} for post_id in ids for shard in range(self._like_shards)]
+        items: Dict[str, Dict[str, Any]] = {}
+        likes: Dict[str, int] = dict.fromkeys(ids, 0)
+        for item in batch_get_items(self.table, keys, consistent_read=consistent_read):
+            if "shard_of" in item:
+                likes[item["shard_of"]] += int(item.get("likes", 0))
+            else:
+                items[item["id"]] = item
+        posts = decoders.load_many((items[post_id] for post_id in ids if post_id in items), Post)
+        for post in posts:
+            post.likes += likes[str(post.id)]
+        return posts
+
+    def get_sparse(self, post_id: uuid.UUID, fields: Sequence[str]) -> Sparse[Post]:
+        cached = self._cache.get(post_id)
+        if cached is not None:
+            return Sparse(Post, fields, {name: getattr(cached, name) for name in fields})
+        if not self._like_shards or "likes" not in fields:
+            return get_sparse_record(post_id, Post, self.table, fields)
+
+        # The shards only have id and likes, so they come back with just those whatever else is projected
+        keys = self._with_shard_keys(post_id)
+        items = {item["id"]: item for item in batch_get_items(self.table, keys, [*fields, "id"])}
+        if str(post_id) not in items:
+            raise RecordNotFound(f"Record with id {post_id} was not found")
+        item = items.pop(str(post_id))
+        item["likes"] = item.get("likes", 0) + sum(int(shard.get("likes", 0)) for shard in items.values())
+        return decoders.load_sparse(item, Post, fields)
+
+    def list_by_date_reversed(
+        self, limit: int, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> Page[PostView]:
+        return query_feed(self.table, Post, limit, cursor, fields)
+
+    def upload(self, image: Union[bytes, memoryview], key: uuid.UUID) -> Image:
+        """Stores the image under its content hash, rendering and uploading it only if it is not in S3 yet"""
+        view = memoryview(image)
+        info = check_image(view, len(view))
+        digest = hashlib.sha256(view).hexdigest()
+        if not self._image_exists(digest, info.format):
+            self._upload_variants(digest, self._render_variants(view))
+            try:
+                self._s3_client.upload_fileobj(
+                    ViewReader(view),
+                    self._bucket_name,
+                    image_key(digest, info.format),
+                    ExtraArgs=self._image_args(IMAGE_FORMAT_CONTENT_TYPES[info.format]),
+                )
+            except ClientError as e:
+                raise AWSError(f"AWS error {e.response['Error']['Code']} uploading image to S3") from e
+        return self._image(key, digest, info.format)
+
+    def _image(self, key: uuid.UUID, digest: str, image_format: str) -> Image:
+        variants = {name: self._object_url(variant_key(digest, name)) for name in variant_names()}
+        return Image(id=key, url=self._object_url(image_key(digest, image_format)), variants=variants)
+
+    def _object_url(self, object_key: str) -> str:
+        return f"https://{self._bucket_name}.s3.amazonaws.com/{object_key}"
+
+    @staticmethod
+    def _image_args(content_type: str) -> Dict[str, str]:
+        return {"ACL": "public-read", "ContentType": content_type, "CacheControl": IMAGE_CACHE_CONTROL}
+
+    def _image_exists(self, digest: str, image_format: str) -> bool:
+        """The original is stored after its variants, so once it exists the variants do too"""
+        try:
+            self._s3_client.head_object(Bucket=self._bucket_name, Key=image_key(digest, image_format))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise AWSError(f"AWS error {e.response['Error']['Code']} reading image from S3") from e
+        return True
+
+    def presign_upload(self, key: uuid.UUID, content_type: str) -> Dict[str, Any]:
+        """Presigned POST letting the client upload the image of a post straight to S3"""
+        try:
+            return self._s3_client.generate_presigned_post(
+                Bucket=self._bucket_name,
+                Key=f"posts/{key}",
+                Fields={"acl": "public-read", "Content-Type": content_type},
+                Conditions=[
+                    {"acl": "public-read"},
+                    {"Content-Type": content_type},
+                    ["content-length-range", 1, IMAGE_UPLOAD_MAX_SIZE],
+                ],
+                ExpiresIn=IMAGE_UPLOAD_EXPIRES,
+            )
+        except ClientError as e:
+            raise AWSError(f"AWS error {e.response['Error']['Code']} presigning image upload") from e
+
+    def inspect_upload(self, key: uuid.UUID) -> ImageInfo:
+        """Checks an image uploaded straight to S3 from its first bytes only, deleting it if it is not acceptable.
+
+        When the header does not fit in them, the next bytes are fetched, twice as many each time.
+        """
+        header, size = self._read_upload(key, 0, IMAGE_HEADER_BYTES)
+        while True:
+            try:
+                return check_image(header, size)
+            except TruncatedImageError:
+                if len(header) >= size:
+                    self._delete_upload(key)
+                    raise
+                header += self._read_upload(key, len(header), len(header))[0]
+            except ImageError:
+                self._delete_upload(key)
+                raise
+
+    def _read_upload(self, key: uuid.UUID, start: int, length: int) -> Tuple[bytes, int]:
+        """`length` bytes of the upload from `start`, and the size of the whole object"""
+        try:
+            result = self._s3_client.get_object(
+                Bucket=self._bucket_name, Key=f"posts/{key}", Range=f"bytes={start}-{start + length - 1}"
+            )
+            data = result["Body"].read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                raise RecordNotFound(f"No image was uploaded for {key}") from e
+            raise AWSError(f"AWS error {e.response['Error']['Code']} reading image from S3") from e
+
+        content_range = result.get("ContentRange")
+        return data, int(content_range.rsplit("/", 1)[1]) if content_range else result["ContentLength"]
+
+    def store_upload(self, key: uuid.UUID, info: ImageInfo) -> Image:
+        """Moves an image uploaded straight to S3 under its content hash, hashed while it is read.
+
+        Images already stored are neither rendered nor copied again. The upload is deleted either way.
+        """
+        hasher = hashlib.sha256()
+        data = bytearray()
+        try:
+            body = self._s3_client.get_object(Bucket=self._bucket_name, Key=f"posts/{key}")["Body"]
+            for chunk in body.iter_chunks(IMAGE_READ_CHUNK):
+                hasher.update(chunk)
+                data += chunk
+        except ClientError as e:
+            raise AWSError(f"AWS error {e.response['Error']['Code']} reading image from S3") from e
+
+        digest = hasher.hexdigest()
+        if not self._image_exists(digest, info.format):
+            try:
+                derivatives = self._render_variants(memoryview(data))
+            except ImageError:
+                self._delete_upload(key)
+                raise
+            self._upload_variants(digest, derivatives)
+            try:
+                self._s3_client.copy_object(
+                    Bucket=self._bucket_name,
+                    Key=image_key(digest, info.format),
+                    CopySource={"Bucket": self._bucket_name, "Key": f"posts/{key}"},
+                    MetadataDirective="REPLACE",
+                    **self._image_args(IMAGE_FORMAT_CONTENT_TYPES[info.format]),
+                )
+            except ClientError as e:
+                raise AWSError(f"AWS error {e.response['Error']['Code']} copying image in S3") from e
+        self._delete_upload(key)
+        return self._image(key, digest, info.format)
 
-    def list_by_date_reversed(self) -> Iterable[Post]:
-        result = self.table.scan(IndexName="by_date")
-        if result["ResponseMetadata"]["HTTPStatusCode"] not in range(200, 300):
-            raise RepositoryError("error occurred when retrieving post details")
-        for item in reversed(result["Items"]):
-            yield validate_and_get_dataclass(item, Post)
+    @staticmethod
+    def _render_variants(image: Union[bytes, memoryview]) -> List[Derivative]:
+        try:
+            return render_variants(image)
+        except (OSError, ValueError) as e:
+            raise ImageError(f"Unreadable image: {e}") from e
+
+    def _upload_variants(self, digest: str, derivatives: List[Derivative]) -> None:
+        for derivative in derivatives:
+            try:
+                self._s3_client.put_object(
+                    Bucket=self._bucket_name,
+                    Key=variant_key(digest, derivative.name),
+                    Body=derivative.data,
+                    **self._image_args(derivative.content_type),
+                )
+            except ClientError as e:
+                raise AWSError(f"AWS error {e.response['Error']['Code']} uploading image variant to S3") from e
+
+    def _delete_upload(self, key: uuid.UUID) -> None:
+        try:
+            self._s3_client.delete_object(Bucket=self._bucket_name, Key=f"posts/{key}")
+        except ClientError as e:
+            raise AWSError(f"AWS error {e.response['Error']['Code']} deleting image from S3") from e
+
+    def update(self, post: Post = None, post_id: uuid.UUID = None, check_version: bool = False) -> None:
+        """Writes only the fields changed since the post was read and bumps its version.
 
-    def upload(self, image: bytes, key: uuid.UUID) -> Image:
-        fp = BytesIO(image)
+        With `check_version` the write only succeeds if nobody else updated the post since it was read. A new image
+        counts as an update, likes do not.
+        """
+        post_id = post_id or post.id
+        changed = post.dirty_fields - {"id", "version", "updated_at"}
+        if not changed:
+            return
+        post.updated_at = datetime.utcnow()
+        changed |= {"updated_at"}
 
+        record = to_item(post)
+        to_set = sorted(name for name in changed if name in record)
+        to_remove = sorted(name for name in changed if name not in record)
+
+        assignments = [f"#{k} = :{k}" for k in to_set] + ["#version = if_not_exists(#version, :zero) + :one"]
+        update_expr = "SET " + ", ".join(assignments)
+        if to_remove:
+            update_expr += " REMOVE " + ", ".join(f"#{k}" for k in to_remove)
+        attr_names = {f"#{k}": k for k in to_set + to_remove + ["version"]}
+        attr_values = {f":{k}": record[k] for k in to_set}
+        attr_values.update({":zero": 0, ":one": 1})
+
+        condition = "attribute_exists(id)"
+        if check_version:
+            attr_values[":version"] = post.version
+            # Posts written before versioning have no version attribute, which reads as version 0
+            if post.version:
+                condition += " AND #version = :version"
+            else:
+                condition += " AND (attribute_not_exists(#version) OR #version = :version)"
+        self._cache.invalidate(post_id)
         try:
-            img = ImageProcess.open(fp)
-        except UnidentifiedImageError:
-            raise ImageError("Unrecognizable image format.")
+            self.table.update_item(
+                Key={"id": str(post_id)},
+                UpdateExpression=update_expr,
+                ConditionExpression=condition,
+                ExpressionAttributeNames=attr_names,
+                ExpressionAttributeValues=attr_values,
+            )
+        except ClientError as e:
+            if is_condition_failure(e) and check_version:
+                # The condition failing says nothing about which part did: the post may be gone altogether
+                get_item(post_id, self.table, ["id"], consistent_read=True)
+                raise ConflictError(f"Record with id {post_id} was modified by another request") from e
+            if is_condition_failure(e):
+                raise RecordNotFound(f"Record with id {post_id} was not found") from e
+            raise AWSError(f"AWS error {e.response['Error']['Code']} updating record {str(post_id)}") from e
 
-        fp.seek(0)
-        image_format = img.format
-        name = f"{key}.{image_format}".lower()
-        url = f"https://{self._bucket_name}.s3.amazonaws.com/posts/{name}"
+        post.version += 1
+        post.mark_clean()
 
+    def set_image(self, post_id: uuid.UUID, image: Image) -> Post:
+        self._cache.invalidate(post_id)
         try:
-            self._s3_client.upload_fileobj(fp, self._bucket_name, f"posts/{key}", ExtraArgs={"ACL": "public-read"})
+            result = self.table.update_item(
+                Key={"id": str(post_id)},
+                UpdateExpression="SET image = :image, updated_at = :now ADD #version :one",
+                ConditionExpression="attribute_exists(id)",
+                ExpressionAttributeNames={"#version": "version"},
+                ExpressionAttributeValues={":image": to_item(image), ":now": utc_timestamp(), ":one": 1},
+                ReturnValues="ALL_NEW",
+            )
         except ClientError as e:
-            raise AWSError(f"AWS error {e.response['Error']['Code']} uploading image to S3") from e
+            if is_condition_failure(e):
+                raise RecordNotFound(f"Record with id {post_id} was not found") from e
+            raise AWSError(f"AWS error {e.response['Error']['Code']} updating record {str(post_id)}") from e
+        return decoders.load(result["Attributes"], Post)
 
-        return Image(id=key, url=url)
+    def increment_likes(self, post_id: uuid.UUID) -> Post:
+        self._cache.invalidate(post_id)
+        if self._like_shards:
+            return self._increment_shard(post_id)
+        # Likes add up whatever order they land in, so they leave the version alone and never conflict with edits
+        try:
+            result = self.table.update_item(
+                Key={"id": str(post_id)},
+                UpdateExpression="ADD likes :one SET updated_at = :now",
+                ConditionExpression="attribute_exists(id)",
+                ExpressionAttributeValues={":one": 1, ":now": utc_timestamp()},
+                ReturnValues="ALL_NEW",
+            )
+        except ClientError as e:
+            if is_condition_failure(e):
+                raise RecordNotFound(f"Record with id {post_id} was not found") from e
+            raise AWSError(f"AWS error {e.response['Error']['Code']} updating record {str(post_id)}") from e
+        return decoders.load(result["Attributes"], Post)
 
-    def update(self, post: Post = None, post_id: uuid.UUID = None) -> None:
+    @staticmethod
+    def _shard_id(post_id: Any, shard: int) -> str:
+        return f"{post_id}{LIKE_SHARD_SEPARATOR}{shard}"
 
-        record = asdict(post, dict_factory=dict_factory)
-        record.pop("id")
-        update_set_expr = "set " + ", ".join(f"#{k} = :{k}" for k, v in record.items())
-        attr_set_names = {f"#{k}": k for k, v in record.items()}
-        attr_values = {f":{k}": v for k, v in record.items()}
+    def _increment_shard(self, post_id: uuid.UUID) -> Post:
+        """Spreads likes of hot posts over `like_shards` items so no single key takes every write.
 
-        kwargs = dict(
-            Key={"id": str(post_id)},
-            UpdateExpression=update_set_expr,
-            ExpressionAttributeValues=attr_values,
-            ExpressionAttributeNames=attr_set_names,
-            ReturnValues="ALL_NEW",
-        )
+        A shard that exists was created for a post that existed, so it is simply incremented. Only creating one
+        checks the post first, so likes of missing posts do not leave orphan shards behind.
+        """
+        update = {
+            "Key": {"id": self._shard_id(post_id, random.randrange(self._like_shards))},
+            "UpdateExpression": "ADD likes :one SET shard_of = :post_id",
+            "ExpressionAttributeValues": {":one": 1, ":post_id": str(post_id)},
+        }
         try:
-            self.table.update_item(**{key: value for key, value in kwargs.items() if len(value)})
+            try:
+                self.table.update_item(**update, ConditionExpression="attribute_exists(shard_of)")
+            except ClientError as e:
+                if not is_condition_failure(e):
+                    raise
+                get_item(post_id, self.table, ["id"], consistent_read=True)
+                self.table.update_item(**update)
         except ClientError as e:
             raise AWSError(f"AWS error {e.response['Error']['Code']} updating record {str(post_id)}") from e
+        return self._get_with_shards(post_id)
+
+    def _with_shard_keys(self, post_id: Any) -> List[Dict[str, Any]]:
+        return [{"id": str(post_id)}] + [{"id": self._shard_id(post_id, shard)} for shard in range(self._like_shards)]
+
+    def _get_with_shards(self, post_id: uuid.UUID, consistent_read: bool = False) -> Post:
+        keys = self._with_shard_keys(post_id)
+        items = {item["id"]: item for item in batch_get_items(self.table, keys, consistent_read=consistent_read)}
+        if str(post_id) not in items:
+            raise RecordNotFound(f"Record with id {post_id} was not found")
+        post = decoders.load(items.pop(str(post_id)), Post)
+        post.likes += sum(int(item.get("likes", 0)) for item in items.values())
+        return post
+
+    def compact_likes(self) -> int:
+        """Folds every like shard back into its post. Returns the number of likes moved"""
+        condition = conditions.Attr("shard_of").exists() & conditions.Attr("likes").gt(0)
+        kwargs: Dict[str, Any] = {"FilterExpression": condition}
+        moved = 0
+        while True:
+            result = self.table.scan(**kwargs)
+            for shard in result["Items"]:
+                moved += self._compact_shard(shard)
+            if "LastEvaluatedKey" not in result:
+                return moved
+            kwargs["ExclusiveStartKey"] = result["LastEvaluatedKey"]
+
+    def _compact_shard(self, shard: Dict[str, Any]) -> int:
+        likes = int(shard["likes"])
+        try:
+            self.table.meta.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Update": {
+                            "TableName": self.table.name,
+                            "Key": {"id": shard["shard_of"]},
+                            "UpdateExpression": "ADD likes :likes",
+                            "ConditionExpression": "attribute_exists(id)",
+                            "ExpressionAttributeValues": {":likes": likes},
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": self.table.name,
+                            "Key": {"id": shard["id"]},
+                            "UpdateExpression": "ADD likes :likes",
+                            "ExpressionAttributeValues": {":likes": -likes},
+                        }
+                    },
+                ]
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "TransactionCanceledException":
+                raise AWSError(f"AWS error {e.response['Error']['Code']} compacting {shard['id']}") from e
+            if "Item" not in self.table.get_item(Key={"id": shard["shard_of"]}, ProjectionExpression="id"):
+                # The post was deleted, so its likes have nowhere to go
+                self.table.delete_item(Key={"id": shard["id"]})
+            # Otherwise a concurrent like hit the shard: it is picked up on the next run
+            return 0
+        return likes
+
+    def get_feed_snapshot(self, limit: int, fields: Optional[Sequence[str]] = None) -> Optional[Page[PostView]]:
+        """First page of the feed read from the snapshot, or None when it cannot serve it"""
+        if not self._feed_snapshot_size or limit > self._feed_snapshot_size:
+            return None
+        try:
+            snapshot = get_item(FEED_SNAPSHOT_ID, self.table)
+        except RecordNotFound:
+            return None
+
+        items = snapshot["posts"][: self._feed_snapshot_size]
+        page = items[:limit]
+        # A snapshot with room to spare holds every post, so there is nothing after it
+        has_more = len(items) > limit or len(items) >= self._feed_snapshot_size
+        cursor = feed_cursor(page[-1]) if page and has_more else None
+        posts: List[PostView]
+        if fields:
+            posts = list(decoders.load_sparse_many(page, Post, fields))
+        else:
+            posts = list(decoders.load_many(page, Post))
+        return Page(posts, cursor)
+
+    def update_feed_snapshot(self, post: Post) -> None:
+        """Puts the current state of `post` in the snapshot if it belongs among the newest posts.
+
+        Concurrent writers are detected through the snapshot version and retried. A write that keeps losing the
+        race is given up: the snapshot stays as it was, a little stale, until the scheduled rebuild.
+        """
+        if not self._feed_snapshot_size:
+            return
+
+        for _ in range(FEED_SNAPSHOT_MAX_ATTEMPTS):
+            try:
+                snapshot = get_item(FEED_SNAPSHOT_ID, self.table, consistent_read=True)
+            except RecordNotFound:
+                return
+
+            item = to_feed_item(post)
+            items = [listed for listed in snapshot["posts"] if listed["id"] != item["id"]]
+            is_listed = len(items) < len(snapshot["posts"])
+            is_full = len(items) >= self._feed_snapshot_size
+            if not is_listed and is_full and item["created_at"] <= items[-1]["created_at"]:
+                return
+
+            items.append(item)
+            items.sort(key=lambda listed: listed["created_at"], reverse=True)
+            version = snapshot["version"]
+            try:
+                self.table.put_item(
+                    Item={"id": FEED_SNAPSHOT_ID, "posts": items[: self._feed_snapshot_size], "version": version + 1},
+                    ConditionExpression="#version = :version",
+                    ExpressionAttributeNames={"#version": "version"},
+                    ExpressionAttributeValues={":version": version},
+                )
+                return
+            except ClientError as e:
+                if not is_condition_failure(e):
+                    raise AWSError(f"AWS error {e.response['Error']['Code']} updating the feed snapshot") from e
+
+    def like_in_feed_snapshot(self, post_id: uuid.UUID) -> None:
+        """Adds a like to `post_id` in the snapshot if it is listed there, writing just its counter.
+
+        The write is conditioned on the post still being at the position read, and bumps the snapshot version so a
+        concurrent rewrite cannot drop it. A like that keeps losing the race waits for the scheduled rebuild.
+        """
+        if not self._feed_snapshot_size:
+            return
+
+        for _ in range(FEED_SNAPSHOT_MAX_ATTEMPTS):
+            try:
+                snapshot = get_item(FEED_SNAPSHOT_ID, self.table)
+            except RecordNotFound:
+                return
+            positions = [position for position, listed in enumerate(snapshot["posts"]) if listed["id"] == str(post_id)]
+            if not positions:
+                return
+
+            # ADD only works on top-level attributes, so the nested counter is SET
+            listed = f"#posts[{positions[0]}]"
+            try:
+                self.table.update_item(
+                    Key={"id": FEED_SNAPSHOT_ID},
+                    UpdateExpression=f"SET {listed}.#likes = {listed}.#likes + :one ADD #version :one",
+                    ConditionExpression=f"{listed}.#id = :id",
+                    ExpressionAttributeNames={"#posts": "posts", "#likes": "likes", "#id": "id", "#version": "version"},
+                    ExpressionAttributeValues={":one": 1, ":id": str(post_id)},
+                )
+                return
+            except ClientError as e:
+                if not is_condition_failure(e):
+                    raise AWSError(f"AWS error {e.response['Error']['Code']} updating the feed snapshot") from e
+
+    def rebuild_feed_snapshot(self) -> int:
+        """Recomputes the snapshot from the feed index. Returns the number of posts in it"""
+        if not self._feed_snapshot_size:
+            return 0
+
+        posts = query_feed(self.table, Post, self._feed_snapshot_size).items
+        try:
+            self.table.update_item(
+                Key={"id": FEED_SNAPSHOT_ID},
+                UpdateExpression="SET posts = :posts ADD #version :one",
+                ExpressionAttributeNames={"#version": "version"},
+                ExpressionAttributeValues={":posts": [to_feed_item(post) for post in posts], ":one": 1},
+            )
+        except ClientError as e:
+            raise AWSError(f"AWS error {e.response['Error']['Code']} rebuilding the feed snapshot") from e
+        return len(posts)
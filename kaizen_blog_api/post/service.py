@@ -1,16 +1,23 @@
-import base64
 import uuid
-from dataclasses import dataclass
-from typing import Iterable, Protocol, runtime_checkable
+from dataclasses import dataclass, field, fields as dataclass_fields
+from typing import Any, List, Optional, Protocol, runtime_checkable
 
 from kink import inject
+from marshmallow.validate import ContainsOnly, OneOf
 
-from kaizen_blog_api.common import BaseRequestClass, request_to_insert
+from kaizen_blog_api.common import BaseListRequest, BaseRequestClass, Page, request_to_insert
 from kaizen_blog_api.errors import ImageError
-from kaizen_blog_api.post.entities import Post
-from kaizen_blog_api.post.repository import IPostRepository
+from kaizen_blog_api.post.entities import ImageUpload, Post
+from kaizen_blog_api.post.ingest import decode_image
+from kaizen_blog_api.post.repository import IMAGE_CONTENT_TYPES, IPostRepository, PostView
 from kaizen_blog_api.validators import validate_and_get_dataclass
 
+POST_FIELDS = tuple(post_field.name for post_field in dataclass_fields(Post))
+
+
+def sparse_fields() -> Any:
+    return field(default=None, metadata={"validate": ContainsOnly(POST_FIELDS)})
+
 
 @dataclass
 class CreatePostRequest:
@@ -20,7 +27,7 @@ class CreatePostRequest:
 
 @dataclass
 class GetPostRequest(BaseRequestClass):
-    pass
+    fields: Optional[List[str]] = sparse_fields()
 
 
 @dataclass
@@ -28,6 +35,11 @@ class LikePostRequest(BaseRequestClass):
     pass
 
 
+@dataclass
+class CreateImageUploadRequest(BaseRequestClass):
+    content_type: str = field(metadata={"validate": OneOf(list(IMAGE_CONTENT_TYPES))})
+
+
 class UpdateImageRequest:
     def __init__(self, post_id: str, image: str, is_base64_encoded: bool):
         self.image = image
@@ -35,23 +47,40 @@ class UpdateImageRequest:
         self.post_id = uuid.UUID(post_id)
 
 
+@dataclass
+class ListPostsRequest(BaseListRequest):
+    fields: Optional[List[str]] = sparse_fields()
+
+
 @runtime_checkable
 class IPostService(Protocol):
     def create(self, request: CreatePostRequest) -> Post:
         ...
 
-    def read(self, request: GetPostRequest) -> Post:
+    def read(self, request: GetPostRequest) -> PostView:
         ...
 
-    def list_reversed(self) -> Iterable[Post]:
+    def list_reversed(self, request: ListPostsRequest) -> Page[PostView]:
         ...
 
     def update_logo(self, request: UpdateImageRequest) -> Post:
         ...
 
+    def create_logo_upload(self, request: CreateImageUploadRequest) -> ImageUpload:
+        ...
+
+    def attach_uploaded_logo(self, post_id: uuid.UUID) -> Post:
+        ...
+
     def like(self, request: LikePostRequest) -> Post:
         ...
 
+    def compact_likes(self) -> int:
+        ...
+
+    def rebuild_feed_snapshot(self) -> int:
+        ...
+
 
 @inject(alias=IPostService)
 class PostService(IPostService):
@@ -62,37 +91,51 @@ class PostService(IPostService):
         data = request_to_insert(request)
         post = validate_and_get_dataclass(data, Post)
         self._repository.insert(post)
+        self._repository.update_feed_snapshot(post)
         return post
 
-    def read(self, request: GetPostRequest) -> Post:
+    def read(self, request: GetPostRequest) -> PostView:
+        if request.fields:
+            return self._repository.get_sparse(request.id, request.fields)
         return self._repository.get(request.id)
 
-    def list_reversed(self) -> Iterable[Post]:
-        posts = self._repository.list_by_date_reversed()
-        for post in posts:
-            yield post
+    def list_reversed(self, request: ListPostsRequest) -> Page[PostView]:
+        if not request.cursor:
+            page = self._repository.get_feed_snapshot(request.limit, request.fields)
+            if page is not None:
+                return page
+        return self._repository.list_by_date_reversed(request.limit, request.cursor, request.fields)
 
     def update_logo(self, request: UpdateImageRequest) -> Post:
         if not request.image:
             raise ImageError("File should be an image")
-        if request.is_base64_encoded:
-            image = base64.b64decode(request.image)
-        else:
-            pos = request.image.find("base64,")
-            if pos > 0:
-                image = base64.b64decode(request.image[(pos + 7) :])  # noqa: E203
-            else:
-                raise ImageError("Invalid image file")
-
-        post = self._repository.get(request.post_id)
+        image = decode_image(request.image, request.is_base64_encoded)
+
         uploaded_image = self._repository.upload(image, request.post_id)
-        post.image = uploaded_image
-        self._repository.update(post, request.post_id)
+        post = self._repository.set_image(request.post_id, uploaded_image)
+        self._repository.update_feed_snapshot(post)
+        return post
 
-        return self._repository.get(request.post_id)
+    def create_logo_upload(self, request: CreateImageUploadRequest) -> ImageUpload:
+        # Only posts that exist get an upload form
+        self._repository.get_sparse(request.id, ["id"])
+        form = self._repository.presign_upload(request.id, request.content_type)
+        return ImageUpload(url=form["url"], fields=form["fields"])
+
+    def attach_uploaded_logo(self, post_id: uuid.UUID) -> Post:
+        info = self._repository.inspect_upload(post_id)
+        image = self._repository.store_upload(post_id, info)
+        post = self._repository.set_image(post_id, image)
+        self._repository.update_feed_snapshot(post)
+        return post
 
     def like(self, request: LikePostRequest) -> Post:
-        post = self._repository.get(request.id)
-        post.likes += 1
-        self._repository.update(post, request.id)
+        post = self._repository.increment_likes(request.id)
+        self._repository.like_in_feed_snapshot(post.id)
         return post
+
+    def compact_likes(self) -> int:
+        return self._repository.compact_likes()
+
+    def rebuild_feed_snapshot(self) -> int:
+        return self._repository.rebuild_feed_snapshot()
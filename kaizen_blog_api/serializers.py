@@ -1,11 +1,44 @@
 import json
 import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, fields as dataclass_fields, is_dataclass
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Any, Dict, List, Tuple
+from types import ModuleType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
 
 from marshmallow import fields
 
+try:
+    import orjson as _orjson
+
+    orjson: Optional[ModuleType] = _orjson
+except ImportError:  # pragma: no cover - optional faster JSON backend
+    orjson = None
+
+C = TypeVar("C")
+T = TypeVar("T")
+
+Converter = Callable[[Any], Any]
+
 
 def dict_factory(data: List[Tuple[str, Any]]) -> Dict[str, Any]:
     return {
@@ -24,6 +57,52 @@ def dict_factory(data: List[Tuple[str, Any]]) -> Dict[str, Any]:
     }
 
 
+def resolve_fields(dataclass: type) -> List[Tuple[str, Any, bool]]:
+    """Returns (name, type, optional) for every field, with Optional[...] unwrapped"""
+    hints = get_type_hints(dataclass)
+    resolved = []
+    for field in dataclass_fields(dataclass):
+        field_type = hints[field.name]
+        optional = False
+        if get_origin(field_type) is Union:
+            args = [arg for arg in get_args(field_type) if arg is not type(None)]  # noqa: E721
+            optional = len(args) < len(get_args(field_type))
+            field_type = args[0] if len(args) == 1 else Any
+        resolved.append((field.name, field_type, optional))
+    return resolved
+
+
+def optional_converter(converter: Converter) -> Converter:
+    return lambda value: None if value is None else converter(value)
+
+
+def identity(value: Any) -> Any:
+    return value
+
+
+class CompiledRegistry(ABC, Generic[C]):
+    """Compiles a per-dataclass helper the first time it is asked for and keeps it around"""
+
+    def __init__(self) -> None:
+        self._compiled: Dict[type, C] = {}
+
+    @abstractmethod
+    def _compile(self, dataclass: type) -> C:
+        ...
+
+    def get(self, dataclass: type) -> C:
+        try:
+            return self._compiled[dataclass]
+        except KeyError:
+            compiled = self._compile(dataclass)
+            self._compiled[dataclass] = compiled
+            return compiled
+
+    def warm(self, *dataclasses: type) -> None:
+        for cls in dataclasses:
+            self.get(cls)
+
+
 class JSONEncoder(json.JSONEncoder):
     def default(self, o: Any) -> Any:
         if isinstance(o, uuid.UUID):
@@ -55,3 +134,137 @@ class CustomDateField(fields.Date):
         if isinstance(value, date):
             return value
         return super()._deserialize(value, attr, data)
+
+
+class ItemMarshaller:
+    """Writes a dataclass straight to a DynamoDB item, skipping asdict and dict_factory"""
+
+    def __init__(self, dataclass: type, registry: "ItemMarshallerRegistry"):
+        self._fields = [
+            (name, self._converter(field_type, registry)) for name, field_type, _ in resolve_fields(dataclass)
+        ]
+
+    @staticmethod
+    def _converter(field_type: Any, registry: "ItemMarshallerRegistry") -> Converter:
+        if field_type is uuid.UUID:
+            return str
+        if field_type is datetime:
+            return lambda value: Decimal(value.timestamp())
+        if isinstance(field_type, type) and is_dataclass(field_type):
+            return registry.get(field_type)
+        return identity
+
+    def __call__(self, entity: Any) -> Dict[str, Any]:
+        item = {}
+        for name, convert in self._fields:
+            value = getattr(entity, name)
+            if value is not None:
+                item[name] = convert(value)
+        return item
+
+
+class ItemMarshallerRegistry(CompiledRegistry[ItemMarshaller]):
+    def _compile(self, dataclass: type) -> ItemMarshaller:
+        return ItemMarshaller(dataclass, self)
+
+
+item_marshallers = ItemMarshallerRegistry()
+
+
+def to_item(entity: Any) -> Dict[str, Any]:
+    return item_marshallers.get(type(entity))(entity)
+
+
+@dataclass
+class Sparse(Generic[T]):
+    """Some of the fields of an entity, as read through a projection"""
+
+    dataclass: Type[T]
+    fields: Sequence[str]
+    values: Dict[str, Any]
+
+
+class JSONBackend:
+    native_types: Tuple[type, ...] = ()
+
+    def dumps(self, data: Any) -> str:
+        return json.dumps(data)
+
+
+class OrjsonBackend(JSONBackend):
+    native_types = (uuid.UUID, datetime, date)
+
+    def dumps(self, data: Any) -> str:
+        # Only used when orjson could be imported
+        return cast(ModuleType, orjson).dumps(data).decode()
+
+
+class EntitySerializer:
+    """Writes a dataclass to JSON field by field, without building the asdict tree first"""
+
+    def __init__(self, dataclass: type, registry: "SerializerRegistry"):
+        self._fields = []
+        for name, field_type, optional in resolve_fields(dataclass):
+            converter = self._converter(field_type, registry)
+            self._fields.append((name, optional_converter(converter) if optional else converter))
+        self._converters = dict(self._fields)
+
+    @staticmethod
+    def _converter(field_type: Any, registry: "SerializerRegistry") -> Converter:
+        if field_type in registry.backend.native_types:
+            return identity
+        if field_type is uuid.UUID:
+            return str
+        if field_type in (datetime, date):
+            return lambda value: value.isoformat()
+        if field_type is Decimal:
+            return float
+        if isinstance(field_type, type) and is_dataclass(field_type):
+            return registry.get(field_type).to_primitive
+        return identity
+
+    def to_primitive(self, entity: Any) -> Dict[str, Any]:
+        return {name: convert(getattr(entity, name)) for name, convert in self._fields}
+
+    def sparse_to_primitive(self, sparse: Sparse) -> Dict[str, Any]:
+        values = sparse.values
+        return {name: self._converters[name](values[name]) if name in values else None for name in sparse.fields}
+
+
+class SerializerRegistry(CompiledRegistry[EntitySerializer]):
+    def __init__(self, backend: JSONBackend):
+        super().__init__()
+        self.backend = backend
+
+    def _compile(self, dataclass: type) -> EntitySerializer:
+        return EntitySerializer(dataclass, self)
+
+    def to_primitive(self, entity: Any) -> Dict[str, Any]:
+        if isinstance(entity, Sparse):
+            return self.get(entity.dataclass).sparse_to_primitive(entity)
+        return self.get(type(entity)).to_primitive(entity)
+
+    def dumps(self, entity: Any) -> str:
+        return self.backend.dumps(self.to_primitive(entity))
+
+    def dumps_many(self, entities: Iterable[Any]) -> str:
+        return self.backend.dumps([self.to_primitive(entity) for entity in entities])
+
+    def dumps_grouped(self, groups: Mapping[Any, Iterable[Any]]) -> str:
+        data = {str(key): [self.to_primitive(entity) for entity in entities] for key, entities in groups.items()}
+        return self.backend.dumps(data)
+
+
+json_serializers = SerializerRegistry(OrjsonBackend() if orjson else JSONBackend())
+
+
+def to_json(entity: Any) -> str:
+    return json_serializers.dumps(entity)
+
+
+def to_json_many(entities: Iterable[Any]) -> str:
+    return json_serializers.dumps_many(entities)
+
+
+def to_json_grouped(groups: Mapping[Any, Iterable[Any]]) -> str:
+    return json_serializers.dumps_grouped(groups)
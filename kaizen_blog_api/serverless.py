@@ -1,8 +1,95 @@
+import base64
+import hashlib
 import json
 from functools import wraps
-from typing import Any
+from typing import Any, Optional
 
+from kaizen_blog_api.compression import compress, negotiate_encoding, should_compress
+from kaizen_blog_api.custom_types import LambdaEvent, LambdaResponse
 from kaizen_blog_api.errors import ApiError, AWSError, ValidationError
+from kaizen_blog_api.outbox import flush_outboxes
+
+CONDITIONAL_METHODS = ("GET", "HEAD")
+
+
+def request_header(event: LambdaEvent, name: str) -> Optional[str]:
+    """Header of an API Gateway event, whatever the case the client sent it in"""
+    name = name.lower()
+    for header, value in (event.get("headers") or {}).items():
+        if header.lower() == name:
+            return value
+    return None
+
+
+def request_method(event: LambdaEvent) -> Optional[str]:
+    return event.get("httpMethod") or event.get("requestContext", {}).get("http", {}).get("method")
+
+
+def etag(body: str) -> str:
+    return '"' + hashlib.blake2b(body.encode(), digest_size=16).hexdigest() + '"'
+
+
+def encoded_etag(tag: str, coding: Optional[str]) -> str:
+    """A strong ETag has to differ between content codings of the same body"""
+    if not coding or not tag.endswith('"') or tag.startswith("W/"):
+        return tag
+    return f'{tag[:-1]}-{coding}"'
+
+
+def etag_matches(if_none_match: str, tag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes do not matter
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    opaque_tags = [candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates]
+    return "*" in candidates or tag in opaque_tags
+
+
+def is_negotiable(event: LambdaEvent, response: LambdaResponse) -> bool:
+    """Whether the content coding of the response depends on the Accept-Encoding of the request"""
+    return isinstance(event, dict) and isinstance(response.get("body"), str) and not response.get("isBase64Encoded")
+
+
+def response_encoding(event: LambdaEvent, response: LambdaResponse) -> Optional[str]:
+    """Content coding for the response body, as negotiated through Accept-Encoding"""
+    if not is_negotiable(event, response) or not should_compress(response["body"]):
+        return None
+    return negotiate_encoding(request_header(event, "Accept-Encoding"))
+
+
+def varying_response(response: LambdaResponse) -> LambdaResponse:
+    """Tells caches that the response was negotiated, including when it was sent uncompressed"""
+    headers = dict(response.get("headers") or {})
+    vary = [value.strip() for value in headers.get("Vary", "").split(",") if value.strip()]
+    if "accept-encoding" not in (value.lower() for value in vary):
+        headers["Vary"] = ", ".join([*vary, "Accept-Encoding"])
+    return {**response, "headers": headers}
+
+
+def compressed_response(response: LambdaResponse, coding: Optional[str]) -> LambdaResponse:
+    """Body compressed with `coding` and base64 encoded, which is how API Gateway takes binary bodies"""
+    if not coding or not response.get("body"):
+        return response
+    headers = {**(response.get("headers") or {}), "Content-Encoding": coding}
+    body = base64.b64encode(compress(response["body"], coding)).decode()
+    return {**response, "headers": headers, "body": body, "isBase64Encoded": True}
+
+
+def conditional_response(event: LambdaEvent, response: LambdaResponse, coding: Optional[str] = None) -> LambdaResponse:
+    """Tags successful reads with a strong ETag and answers a matching If-None-Match with 304 Not Modified.
+
+    Handlers that can tell cheaply whether their data changed set the ETag header themselves; otherwise it
+    is a hash of the body.
+    """
+    if response.get("statusCode") != 200 or not isinstance(response.get("body"), str):
+        return response
+    if not isinstance(event, dict) or request_method(event) not in CONDITIONAL_METHODS:
+        return response
+
+    headers = dict(response.get("headers") or {})
+    headers["ETag"] = encoded_etag(headers.get("ETag") or etag(response["body"]), coding)
+    if_none_match = request_header(event, "If-None-Match")
+    if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+        return {"statusCode": 304, "headers": headers, "body": ""}
+    return {**response, "headers": headers}
 
 
 def serverless(serverless_handler: Any) -> Any:
@@ -10,7 +97,12 @@ def serverless(serverless_handler: Any) -> Any:
         @wraps(fn)
         def execute_serverless(*args, **kwargs):  # type: ignore
             try:
-                return fn(*args, **kwargs)
+                response = fn(*args, **kwargs)
+                event = args[0] if args else kwargs.get("event")
+                negotiated = is_negotiable(event, response)
+                coding = response_encoding(event, response)
+                response = compressed_response(conditional_response(event, response, coding), coding)
+                return varying_response(response) if negotiated else response
             except AWSError as e:
                 return {
                     "statusCode": e.status_code,
@@ -26,6 +118,8 @@ def serverless(serverless_handler: Any) -> Any:
                 return {"statusCode": e.status_code, "body": json.dumps(body)}
             except Exception as e:
                 return {"statusCode": 500, "body": '{"error": "' + str(e) + '"}'}
+            finally:
+                flush_outboxes()
 
         return execute_serverless
 
@@ -0,0 +1,21 @@
+from typing import Any, FrozenSet
+
+
+class DirtyTracking:
+    """Remembers which dataclass fields were assigned since the entity was built or last saved.
+
+    Dataclasses using it call `mark_clean()` at the end of `__post_init__`.
+    """
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        dirty = self.__dict__.get("_dirty")
+        if dirty is not None and name in self.__dataclass_fields__:  # type: ignore
+            dirty.add(name)
+        super().__setattr__(name, value)
+
+    @property
+    def dirty_fields(self) -> FrozenSet[str]:
+        return frozenset(self.__dict__.get("_dirty", ()))
+
+    def mark_clean(self) -> None:
+        self.__dict__["_dirty"] = set()
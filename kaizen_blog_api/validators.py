@@ -1,11 +1,11 @@
 from datetime import date, datetime
-from typing import Any, Dict, Type, TypeVar, cast
+from typing import Any, Dict, Iterable, List, Type, TypeVar, cast
 
 from marshmallow import Schema, exceptions
 from marshmallow_dataclass import class_schema
 
 from kaizen_blog_api.errors import ValidationError
-from kaizen_blog_api.serializers import CustomDateField, CustomDateTimeField
+from kaizen_blog_api.serializers import CompiledRegistry, CustomDateField, CustomDateTimeField
 
 T = TypeVar("T")
 
@@ -17,11 +17,27 @@ class BaseSchema(Schema):
     }
 
 
-def validate_and_get_dataclass(data: Dict[str, Any], dataclass: Type[T]) -> T:
-    schema_cls = class_schema(dataclass, base_schema=BaseSchema)
-    schema = schema_cls()
+class SchemaRegistry(CompiledRegistry[Schema]):
+    """Compiles every dataclass schema once and keeps the instance around"""
+
+    def _compile(self, dataclass: type) -> Schema:
+        return class_schema(dataclass, base_schema=BaseSchema)()
+
+    def load(self, data: Dict[str, Any], dataclass: Type[T]) -> T:
+        try:
+            return cast(T, self.get(dataclass).load(data))
+        except exceptions.ValidationError as e:
+            raise ValidationError(e.messages)
+
+    def load_many(self, items: Iterable[Dict[str, Any]], dataclass: Type[T]) -> List[T]:
+        try:
+            return cast(List[T], self.get(dataclass).load(list(items), many=True))
+        except exceptions.ValidationError as e:
+            raise ValidationError(e.messages)
 
-    try:
-        return cast(T, schema.load(data))
-    except exceptions.ValidationError as e:
-        raise ValidationError(e.messages)
+
+schemas = SchemaRegistry()
+
+
+def validate_and_get_dataclass(data: Dict[str, Any], dataclass: Type[T]) -> T:
+    return schemas.load(data, dataclass)
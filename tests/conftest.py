@@ -1,18 +1,28 @@
 import uuid
-from dataclasses import asdict
-from typing import Any
+from io import BytesIO
+from typing import Any, Tuple
 
 import boto3
 import pytest
 from moto import mock_dynamodb2, mock_s3, mock_ses, mock_sns
+from PIL import Image as ImageProcess
 
+from kaizen_blog_api import SNS_ARN
 from kaizen_blog_api.comment.entities import Comment
 from kaizen_blog_api.comment.repository import CommentRepository
 from kaizen_blog_api.comment.service import CommentService
+from kaizen_blog_api.common import to_feed_item
+from kaizen_blog_api.outbox import EventOutbox
 from kaizen_blog_api.post.entities import Image, Post
 from kaizen_blog_api.post.repository import PostRepository
 from kaizen_blog_api.post.service import PostService
-from kaizen_blog_api.serializers import dict_factory
+
+
+def make_image(image_format: str, mode: str = "RGB", size: Tuple[int, int] = (321, 123), **options: Any) -> bytes:
+    """A plain image encoded in `image_format`, with `options` passed to Pillow's save"""
+    out = BytesIO()
+    ImageProcess.new(mode, size, "red" if mode != "P" else 1).save(out, image_format, **options)
+    return out.getvalue()
 
 
 @pytest.fixture()
@@ -52,10 +62,19 @@ def dynamodb_tables_fixture() -> Any:
                     ],
                     "Projection": {"ProjectionType": "ALL"},
                 },
+                {
+                    "IndexName": "by_feed",
+                    "KeySchema": [
+                        {"AttributeName": "feed_bucket", "KeyType": "HASH"},
+                        {"AttributeName": "created_at", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                },
             ],
             AttributeDefinitions=[
                 {"AttributeName": "id", "AttributeType": "S"},
                 {"AttributeName": "created_at", "AttributeType": "N"},
+                {"AttributeName": "feed_bucket", "AttributeType": "S"},
             ],
             BillingMode="PAY_PER_REQUEST",
         )
@@ -71,10 +90,28 @@ def dynamodb_tables_fixture() -> Any:
                     ],
                     "Projection": {"ProjectionType": "ALL"},
                 },
+                {
+                    "IndexName": "by_feed",
+                    "KeySchema": [
+                        {"AttributeName": "feed_bucket", "KeyType": "HASH"},
+                        {"AttributeName": "created_at", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                },
+                {
+                    "IndexName": "by_post",
+                    "KeySchema": [
+                        {"AttributeName": "post_id", "KeyType": "HASH"},
+                        {"AttributeName": "created_at", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                },
             ],
             AttributeDefinitions=[
                 {"AttributeName": "id", "AttributeType": "S"},
                 {"AttributeName": "created_at", "AttributeType": "N"},
+                {"AttributeName": "feed_bucket", "AttributeType": "S"},
+                {"AttributeName": "post_id", "AttributeType": "S"},
             ],
             BillingMode="PAY_PER_REQUEST",
         )
@@ -93,12 +130,15 @@ def many_dummy_posts() -> None:
 
     for num in range(25):
         post = Post(id=uuid.uuid4(), text=f"Post number {num}", username=f"user {num}")
-        posts_table.put_item(Item=asdict(post, dict_factory=dict_factory))
+        posts_table.put_item(Item=to_feed_item(post))
 
 
 @pytest.fixture()
 def image_bytes() -> bytes:
-    return b"GIF89a\x01\x00\x01\x00\x00\xff\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x00;"
+    return (
+        b"GIF87a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\x00\x00\x00"
+        b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x08\x04\x00\x01\x04\x04\x00;"
+    )
 
 
 @pytest.mark.usefixtures("dynamodb_tables_fixture")
@@ -109,7 +149,7 @@ def many_dummy_comments() -> None:
 
     for num in range(25):
         comment = Comment(id=uuid.uuid4(), text=f"Post number {num}", username=f"user {num}", post_id=uuid.uuid4())
-        posts_table.put_item(Item=asdict(comment, dict_factory=dict_factory))
+        posts_table.put_item(Item=to_feed_item(comment))
 
 
 @pytest.fixture()
@@ -136,5 +176,19 @@ def comment_service() -> CommentService:
     with mock_ses():
         ses = boto3.client("ses", region_name="eu-west-1")
         ses.verify_email_identity(EmailAddress="amlluch@gmail.com")
-    repository = CommentRepository(table, sns, ses_client=ses)
+    repository = CommentRepository(table, sns, ses_client=ses, outbox=EventOutbox(sns, SNS_ARN))
     return CommentService(repository)
+
+
+@pytest.fixture()
+def sharded_post_service(post_service: PostService) -> PostService:
+    repository = post_service._repository
+    return PostService(PostRepository(repository.table, repository._bucket_name, repository._s3_client, like_shards=4))
+
+
+@pytest.fixture()
+def snapshot_post_service(post_service: PostService) -> PostService:
+    repository = post_service._repository
+    return PostService(
+        PostRepository(repository.table, repository._bucket_name, repository._s3_client, feed_snapshot_size=5)
+    )
@@ -0,0 +1,78 @@
+import uuid
+
+from kaizen_blog_api.cache import RecordCache
+from kaizen_blog_api.post.entities import Post
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_post() -> Post:
+    return Post(id=uuid.uuid4(), text="cached text", username="user test")
+
+
+def test_cache_is_off_by_default() -> None:
+    # given
+    cache: RecordCache[Post] = RecordCache("posts")
+    post = make_post()
+
+    # when
+    cache.put(post.id, post)
+
+    # then
+    assert cache.get(post.id) is None
+    assert cache.stats() == {"hits": 0, "misses": 0, "evictions": 0, "size": 0}
+
+
+def test_cache_returns_copies() -> None:
+    # given
+    cache: RecordCache[Post] = RecordCache("posts", size=2)
+    post = make_post()
+    cache.put(post.id, post)
+
+    # when
+    post.text = "changed after caching"
+    cached = cache.get(post.id)
+    cached.text = "changed after reading"
+
+    # then
+    assert cache.get(post.id).text == "cached text"
+    assert cache.hits == 2
+
+
+def test_cache_expires_records() -> None:
+    # given
+    clock = FakeClock()
+    cache: RecordCache[Post] = RecordCache("posts", size=2, ttl=10, clock=clock)
+    post = make_post()
+    cache.put(post.id, post)
+
+    # when
+    clock.now = 10
+
+    # then
+    assert cache.get(post.id) is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "evictions": 0, "size": 0}
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    # given
+    cache: RecordCache[Post] = RecordCache("posts", size=2)
+    first, second, third = make_post(), make_post(), make_post()
+    cache.put(first.id, first)
+    cache.put(second.id, second)
+
+    # when
+    cache.get(first.id)
+    cache.put(third.id, third)
+
+    # then
+    assert cache.get(second.id) is None
+    assert cache.get(first.id) is not None
+    assert cache.get(third.id) is not None
+    assert cache.evictions == 1
@@ -0,0 +1,82 @@
+import json
+import uuid
+from dataclasses import asdict
+from typing import Any, Dict, List
+
+import pytest
+
+from kaizen_blog_api.comment.entities import Comment
+from kaizen_blog_api.controller import admin_notify
+from kaizen_blog_api.errors import AWSError
+from kaizen_blog_api.events import CommentDeletedEvent, Event
+
+FAILING_ID = "fail"
+
+
+class RecordingService:
+    def __init__(self) -> None:
+        self.notified: List[str] = []
+
+    def notify(self, request: Event) -> None:
+        if request.id == FAILING_ID:
+            raise AWSError("SES is down")
+        self.notified.append(request.id)
+
+
+def message(event_id: str) -> str:
+    comment = Comment(id=uuid.uuid4(), username="user test", text="text test", post_id=uuid.uuid4())
+    return json.dumps({**asdict(CommentDeletedEvent(comment)), "id": event_id})
+
+
+def sns_record(event_id: str) -> Dict[str, Any]:
+    return {"EventSource": "aws:sns", "Sns": {"MessageId": f"sns-{event_id}", "Message": message(event_id)}}
+
+
+def sqs_record(event_id: str, body: str) -> Dict[str, Any]:
+    return {"eventSource": "aws:sqs", "messageId": f"sqs-{event_id}", "body": body}
+
+
+def test_notifies_every_sns_record() -> None:
+    # given
+    service = RecordingService()
+    event = {"Records": [sns_record(str(num)) for num in range(3)]}
+
+    # when
+    result = admin_notify(event, None, service)
+
+    # then
+    assert result is None
+    assert service.notified == ["0", "1", "2"]
+
+
+def test_sns_failure_is_raised_after_the_batch() -> None:
+    # given
+    service = RecordingService()
+    event = {"Records": [sns_record(FAILING_ID), sns_record("1")]}
+
+    # then
+    with pytest.raises(AWSError):
+        admin_notify(event, None, service)
+    assert service.notified == ["1"]
+
+
+def test_sqs_reports_failed_records() -> None:
+    # given
+    service = RecordingService()
+    enveloped = json.dumps({"Type": "Notification", "MessageId": "envelope", "Message": message("1")})
+    event = {
+        "Records": [
+            sqs_record("0", message("0")),
+            sqs_record("1", enveloped),
+            sqs_record(FAILING_ID, message(FAILING_ID)),
+            sqs_record("malformed", "{not json"),
+            sqs_record("invalid", json.dumps({"id": "invalid"})),
+        ]
+    }
+
+    # when
+    result = admin_notify(event, None, service)
+
+    # then
+    assert service.notified == ["0", "1"]
+    assert result == {"batchItemFailures": [{"itemIdentifier": f"sqs-{FAILING_ID}"}]}
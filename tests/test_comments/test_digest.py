@@ -0,0 +1,184 @@
+import uuid
+from logging import Logger
+from typing import Any
+from unittest.mock import Mock
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+from kink import di
+
+from kaizen_blog_api import ADMIN_EMAIL_ADDRESS, SENDER_EMAIL_ADDRESS
+from kaizen_blog_api.comment.emails import digest_email
+from kaizen_blog_api.comment.entities import Comment
+from kaizen_blog_api.comment.repository import CommentRepository
+from kaizen_blog_api.comment.service import CommentService
+from kaizen_blog_api.errors import AWSError
+from kaizen_blog_api.events import CommentDeletedEvent, Event
+
+DIGEST_SIZE = 3
+
+
+@pytest.fixture()
+def ses_stub() -> Any:
+    ses = boto3.client("ses", region_name="eu-west-1", aws_access_key_id="testing", aws_secret_access_key="testing")
+    with Stubber(ses) as stub:
+        yield stub
+        stub.assert_no_pending_responses()
+
+
+@pytest.fixture()
+def digest_service(comment_service: CommentService, ses_stub: Stubber) -> CommentService:
+    repository = comment_service._repository
+    return CommentService(CommentRepository(repository.table, repository.sns, ses_stub.client), DIGEST_SIZE)
+
+
+def deleted_comment(text: str) -> Comment:
+    return Comment(id=uuid.uuid4(), text=text, username="user test", post_id=uuid.uuid4())
+
+
+def deleted(text: str) -> Event:
+    return CommentDeletedEvent(deleted_comment(text))
+
+
+def expect_email(stub: Stubber, subject: str) -> None:
+    expected = {
+        "Destination": {"ToAddresses": [ADMIN_EMAIL_ADDRESS]},
+        "Message": {
+            "Body": {"Html": {"Charset": "UTF-8", "Data": ANY}, "Text": {"Charset": "UTF-8", "Data": ANY}},
+            "Subject": {"Charset": "UTF-8", "Data": subject},
+        },
+        "Source": SENDER_EMAIL_ADDRESS,
+    }
+    stub.add_response("send_email", {"MessageId": str(uuid.uuid4())}, expected)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_digest_is_sent_at_the_threshold(digest_service: CommentService, ses_stub: Stubber) -> None:
+    # given
+    expect_email(ses_stub, f"{DIGEST_SIZE} comments were deleted")
+
+    # when
+    for num in range(DIGEST_SIZE + 1):
+        digest_service.notify(deleted(f"comment {num}"))
+
+    # then
+    pending = digest_service._repository.take_deletions()
+    assert [comment.text for comment in pending] == [f"comment {DIGEST_SIZE}"]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_scheduled_flush(digest_service: CommentService, ses_stub: Stubber) -> None:
+    # given
+    digest_service.notify(deleted("first"))
+    digest_service.notify(deleted("second"))
+    expect_email(ses_stub, "2 comments were deleted")
+
+    # when
+    sent = digest_service.flush_digest()
+
+    # then
+    assert sent == 2
+    assert digest_service.flush_digest() == 0
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_failed_digest_is_kept(digest_service: CommentService, ses_stub: Stubber) -> None:
+    # given
+    digest_service.notify(deleted("first"))
+    ses_stub.add_client_error("send_email", "Throttling", http_status_code=400)
+
+    # when
+    with pytest.raises(AWSError):
+        digest_service.flush_digest()
+    digest_service.notify(deleted("second"))
+
+    # then
+    assert [comment.text for comment in digest_service._repository.take_deletions()] == ["first", "second"]
+
+
+def test_digest_email_escapes_html() -> None:
+    # given
+    comments = [
+        Comment(id=uuid.uuid4(), text=text, username="user test", post_id=uuid.uuid4())
+        for text in ("<script>alert(1)</script>", "plain")
+    ]
+
+    # when
+    email = digest_email(comments)
+
+    # then
+    assert email.subject == "2 comments were deleted"
+    assert "&lt;script&gt;" in email.html and "<script>" not in email.html
+    assert "<script>alert(1)</script>" in email.text and "plain" in email.text
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_failed_threshold_flush_does_not_fail_the_message(digest_service: CommentService, ses_stub: Stubber) -> None:
+    # given
+    for num in range(DIGEST_SIZE - 1):
+        digest_service.notify(deleted(f"comment {num}"))
+    ses_stub.add_client_error("send_email", "Throttling", http_status_code=400)
+
+    # when
+    digest_service.notify(deleted("at the threshold"))
+
+    # then
+    pending = digest_service._repository.take_deletions()
+    assert [comment.text for comment in pending] == ["comment 0", "comment 1", "at the threshold"]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_flush_sends_digests_of_at_most_the_digest_size(digest_service: CommentService, ses_stub: Stubber) -> None:
+    # given
+    for num in range(DIGEST_SIZE + 2):
+        digest_service._repository.buffer_deletion(deleted_comment(f"comment {num}"), 10)
+    expect_email(ses_stub, f"{DIGEST_SIZE} comments were deleted")
+    ses_stub.add_client_error("send_email", "Throttling", http_status_code=400)
+
+    # when
+    with pytest.raises(AWSError):
+        digest_service.flush_digest()
+
+    # then
+    pending = digest_service._repository.take_deletions()
+    assert [comment.text for comment in pending] == [f"comment {DIGEST_SIZE}", f"comment {DIGEST_SIZE + 1}"]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_full_buffer_is_drained_before_buffering(comment_service: CommentService, ses_stub: Stubber) -> None:
+    # given
+    repository = CommentRepository(comment_service._repository.table, comment_service._repository.sns, ses_stub.client)
+    service = CommentService(repository, DIGEST_SIZE, admin_digest_max_pending=2)
+    service.notify(deleted("first"))
+    service.notify(deleted("second"))
+    expect_email(ses_stub, "2 comments were deleted")
+
+    # when
+    service.notify(deleted("third"))
+
+    # then
+    assert [comment.text for comment in repository.take_deletions()] == ["third"]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_full_buffer_gives_deletions_up(comment_service: CommentService, ses_stub: Stubber) -> None:
+    # given
+    repository = CommentRepository(comment_service._repository.table, comment_service._repository.sns, ses_stub.client)
+    logger = Mock(spec=Logger)
+    service = CommentService(repository, DIGEST_SIZE, logger, admin_digest_max_pending=2)
+    service.notify(deleted("first"))
+    service.notify(deleted("second"))
+    ses_stub.add_client_error("send_email", "Throttling", http_status_code=400)
+
+    # when
+    service.notify(deleted("third"))
+
+    # then
+    assert [comment.text for comment in repository.take_deletions()] == ["first", "second"]
+    assert "third" in logger.error.call_args[0][0]
+
+
+def test_service_gets_the_logger() -> None:
+    # then
+    assert CommentService(Mock())._logger is di[Logger]
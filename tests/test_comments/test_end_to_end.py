@@ -6,8 +6,16 @@ from typing import Dict
 import pytest
 
 from kaizen_blog_api.comment.entities import Comment
-from kaizen_blog_api.comment.service import CommentService
-from kaizen_blog_api.controller import admin_notify, create_comment, delete_comment, list_comments, read_comment
+from kaizen_blog_api.comment.service import MAX_BATCH_POSTS, CommentService
+from kaizen_blog_api.controller import (
+    admin_notify,
+    create_comment,
+    delete_comment,
+    list_comments,
+    list_comments_for_posts,
+    list_post_comments,
+    read_comment,
+)
 from kaizen_blog_api.events import CommentDeletedEvent
 
 
@@ -41,6 +49,7 @@ class TestComment:
         event = {"pathParameters": {"id": str(body["id"])}}
         response = delete_comment(event, None, comment_service)
         assert response["statusCode"] == 204
+        assert comment_service._repository._outbox.stats() == {"sent": 1, "retried": 0, "failed": 0, "pending": 0}
 
     @pytest.mark.parametrize(
         "body",
@@ -86,3 +95,106 @@ class TestComment:
         # then
         body = json.loads(response["body"])
         assert body[0]["created_at"] > body[-1]["created_at"]
+
+    @pytest.mark.usefixtures("many_dummy_comments")
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_list_comments_paginated(self, comment_service: CommentService) -> None:
+
+        # when
+        response = list_comments({"queryStringParameters": {"limit": "20"}}, None, comment_service)
+        cursor = response["headers"]["X-Next-Cursor"]
+        next_response = list_comments(
+            {"queryStringParameters": {"limit": "20", "cursor": cursor}}, None, comment_service
+        )
+
+        # then
+        first, second = json.loads(response["body"]), json.loads(next_response["body"])
+        assert len(first) == 20
+        assert len(second) == 5
+        assert not {comment["id"] for comment in first} & {comment["id"] for comment in second}
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_list_post_comments(self, comment_service: CommentService) -> None:
+        # given
+        post_id, other_post_id = str(uuid.uuid4()), str(uuid.uuid4())
+        for num in range(5):
+            body = {"text": f"comment {num}", "username": "user test", "post_id": post_id}
+            create_comment({"body": json.dumps(body)}, None, comment_service)
+        body = {"text": "other comment", "username": "user test", "post_id": other_post_id}
+        create_comment({"body": json.dumps(body)}, None, comment_service)
+
+        # when
+        event = {"pathParameters": {"id": post_id}, "queryStringParameters": {"limit": "3"}}
+        first = list_post_comments(event, None, comment_service)
+        event["queryStringParameters"]["cursor"] = first["headers"]["X-Next-Cursor"]
+        second = list_post_comments(event, None, comment_service)
+
+        # then
+        comments = json.loads(first["body"]) + json.loads(second["body"])
+        assert [comment["text"] for comment in comments] == [f"comment {num}" for num in range(5)]
+        assert "X-Next-Cursor" not in second["headers"]
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_list_comments_for_posts(self, comment_service: CommentService) -> None:
+        # given
+        post_ids = [str(uuid.uuid4()) for _ in range(3)]
+        for post_id in post_ids[:2]:
+            for num in range(4):
+                body = {"text": f"comment {num}", "username": "user test", "post_id": post_id}
+                create_comment({"body": json.dumps(body)}, None, comment_service)
+
+        # when
+        event = {"queryStringParameters": {"post_ids": ",".join(post_ids), "limit": "2"}}
+        response = list_comments_for_posts(event, None, comment_service)
+
+        # then
+        assert response["statusCode"] == 200
+        body = json.loads(response["body"])
+        assert [len(body[post_id]) for post_id in post_ids] == [2, 2, 0]
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_list_comments_for_a_full_batch(self, comment_service: CommentService) -> None:
+        # given
+        post_ids = [str(uuid.uuid4()) for _ in range(MAX_BATCH_POSTS)]
+        for post_id in post_ids:
+            body = {"text": f"comment on {post_id}", "username": "user test", "post_id": post_id}
+            create_comment({"body": json.dumps(body)}, None, comment_service)
+
+        # when
+        event = {"queryStringParameters": {"post_ids": ",".join(post_ids), "limit": "2"}}
+        response = list_comments_for_posts(event, None, comment_service)
+
+        # then
+        body = json.loads(response["body"])
+        assert list(body) == post_ids
+        assert [body[post_id][0]["text"] for post_id in post_ids] == [f"comment on {post_id}" for post_id in post_ids]
+
+    @pytest.mark.parametrize("params", [{}, {"post_ids": ""}, {"post_ids": ",".join(["not-a-uuid"] * 2)}])
+    def test_list_comments_for_posts_fails(self, params: Dict, comment_service: CommentService) -> None:
+        # when
+        response = list_comments_for_posts({"queryStringParameters": params}, None, comment_service)
+
+        # then
+        assert response["statusCode"] == 422
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_delete_missing_comment(self, comment_service: CommentService) -> None:
+        # when
+        response = delete_comment({"pathParameters": {"id": str(uuid.uuid4())}}, None, comment_service)
+
+        # then
+        assert response["statusCode"] == 404
+
+    @pytest.mark.usefixtures("many_dummy_comments")
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_list_comments_not_modified(self, comment_service: CommentService) -> None:
+        # given
+        first = list_comments({"httpMethod": "GET"}, None, comment_service)
+
+        # when
+        event = {"httpMethod": "GET", "headers": {"If-None-Match": f'W/{first["headers"]["ETag"]}'}}
+        response = list_comments(event, None, comment_service)
+
+        # then
+        assert response["statusCode"] == 304
+        assert response["headers"]["ETag"] == first["headers"]["ETag"]
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from kaizen_blog_api.common import batch_get_items, projection
+from kaizen_blog_api.errors import RepositoryError
+
+
+class FlakyClient:
+    """Leaves every key but the first unprocessed on each call, like a throttled table"""
+
+    def __init__(self) -> None:
+        self.calls: List[Dict[str, Any]] = []
+
+    def batch_get_item(self, RequestItems: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls.append(RequestItems)
+        first, *rest = RequestItems["posts"]["Keys"]
+        unprocessed = {"posts": {**RequestItems["posts"], "Keys": rest}} if rest else {}
+        return {"Responses": {"posts": [first]}, "UnprocessedKeys": unprocessed}
+
+
+def fake_table(client: FlakyClient) -> Any:
+    return SimpleNamespace(name="posts", meta=SimpleNamespace(client=client))
+
+
+def test_batch_get_items_retries_unprocessed_keys() -> None:
+    # given
+    client = FlakyClient()
+    keys = [{"id": str(num)} for num in range(3)]
+
+    # when
+    items = batch_get_items(fake_table(client), keys, fields=["id"], backoff=0)
+
+    # then
+    assert items == keys
+    assert len(client.calls) == 3
+    assert client.calls[-1]["posts"]["ProjectionExpression"] == "#p0"
+
+
+def test_batch_get_items_gives_up() -> None:
+    # given
+    keys = [{"id": str(num)} for num in range(5)]
+
+    # then
+    with pytest.raises(RepositoryError):
+        batch_get_items(fake_table(FlakyClient()), keys, max_attempts=2, backoff=0)
+
+
+def test_projection_reads_repeated_fields_once() -> None:
+    # when
+    result = projection(["id", "likes", "id"])
+
+    # then
+    assert result == {"ProjectionExpression": "#p0, #p1", "ExpressionAttributeNames": {"#p0": "id", "#p1": "likes"}}
@@ -0,0 +1,40 @@
+import gzip
+
+import pytest
+
+from kaizen_blog_api.compression import COMPRESSORS, compress, negotiate_encoding
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, None),
+        ("identity", None),
+        ("gzip, deflate", "gzip"),
+        ("deflate;q=1, gzip;q=0.5", "deflate"),
+        ("gzip;q=0, *", "br" if "br" in COMPRESSORS else "deflate"),
+        ("GZIP", "gzip"),
+        ("gzip;q=oops, deflate", "deflate"),
+    ],
+)
+def test_negotiate_encoding(accept_encoding: str, expected: str) -> None:
+    # then
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("coding", list(COMPRESSORS))
+def test_compress_is_deterministic(coding: str) -> None:
+    # given
+    body = '{"text": "blog text"}' * 100
+
+    # then
+    assert compress(body, coding) == compress(body, coding)
+    assert len(compress(body, coding)) < len(body)
+
+
+def test_gzip_round_trip() -> None:
+    # given
+    body = '{"text": "blog text"}' * 100
+
+    # then
+    assert gzip.decompress(compress(body, "gzip", level=9)).decode() == body
@@ -0,0 +1,31 @@
+from dataclasses import asdict
+
+from kaizen_blog_api.comment.entities import Comment
+from kaizen_blog_api.decoders import DecoderRegistry
+from kaizen_blog_api.post.entities import Image, Post
+from kaizen_blog_api.serializers import dict_factory
+from kaizen_blog_api.validators import validate_and_get_dataclass
+
+
+def test_decode_matches_validation(dummy_post: Post) -> None:
+    # given
+    item = asdict(dummy_post, dict_factory=dict_factory)
+
+    # when
+    post = DecoderRegistry().load(item, Post)
+
+    # then
+    assert post == validate_and_get_dataclass(item, Post)
+    assert isinstance(post.image, Image)
+
+
+def test_decode_without_optional_fields(dummy_comment: Comment) -> None:
+    # given
+    item = asdict(dummy_comment, dict_factory=dict_factory)
+    item["unknown"] = "ignored"
+
+    # when
+    comments = DecoderRegistry().load_many([item, item], Comment)
+
+    # then
+    assert comments == [validate_and_get_dataclass(asdict(dummy_comment, dict_factory=dict_factory), Comment)] * 2
@@ -0,0 +1,47 @@
+import uuid
+from dataclasses import asdict
+from datetime import datetime
+from logging import Logger
+
+import boto3
+import pytest
+from kink import di
+
+from kaizen_blog_api.common import FEED_OLDEST_ID, to_feed_item
+from kaizen_blog_api.migrations import backfill_feed_buckets, record_oldest_feed_bucket
+from kaizen_blog_api.post.entities import Post
+from kaizen_blog_api.post.service import ListPostsRequest, PostService
+from kaizen_blog_api.serializers import dict_factory
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_backfill_feed_buckets(post_service: PostService) -> None:
+    # given
+    table = boto3.resource("dynamodb", region_name="eu-west-1").Table("posts")
+    for num in range(5):
+        post = Post(id=uuid.uuid4(), text=f"Post number {num}", username=f"user {num}")
+        table.put_item(Item=asdict(post, dict_factory=dict_factory))
+    assert not post_service.list_reversed(ListPostsRequest()).items
+
+    # when
+    updated = backfill_feed_buckets(table, di[Logger])
+
+    # then
+    assert updated == 5
+    assert len(post_service.list_reversed(ListPostsRequest()).items) == 5
+    assert backfill_feed_buckets(table, di[Logger]) == 0
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_record_oldest_feed_bucket() -> None:
+    # given
+    table = boto3.resource("dynamodb", region_name="eu-west-1").Table("posts")
+    for month in (9, 3, 6):
+        post = Post(id=uuid.uuid4(), text="old post", username="user test", created_at=datetime(2022, month, 1))
+        table.put_item(Item=to_feed_item(post))
+
+    # when
+    record_oldest_feed_bucket(table, di[Logger])
+
+    # then
+    assert table.get_item(Key={"id": FEED_OLDEST_ID})["Item"]["oldest_bucket"] == "2022-03"
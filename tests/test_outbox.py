@@ -0,0 +1,101 @@
+from typing import Any, Dict, List, Optional
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+
+from kaizen_blog_api.outbox import EventOutbox
+from kaizen_blog_api.serverless import serverless
+
+TOPIC_ARN = "arn:aws:sns:eu-west-1:123456789012:testing"
+
+
+@pytest.fixture()
+def sns_stub() -> Any:
+    sns = boto3.client("sns", region_name="eu-west-1", aws_access_key_id="testing", aws_secret_access_key="testing")
+    with Stubber(sns) as stub:
+        yield stub
+        stub.assert_no_pending_responses()
+
+
+def expect_batch(stub: Stubber, size: int, failed: Optional[List[Dict[str, Any]]] = None) -> None:
+    expected = {"TopicArn": TOPIC_ARN, "PublishBatchRequestEntries": ANY}
+    successful = [{"Id": f"ok{num}", "MessageId": f"m{num}"} for num in range(size - len(failed or []))]
+    stub.add_response("publish_batch", {"Successful": successful, "Failed": failed or []}, expected)
+
+
+def outbox_with(stub: Stubber, count: int) -> EventOutbox:
+    outbox = EventOutbox(stub.client, TOPIC_ARN, backoff=0)
+    for num in range(count):
+        outbox.add(f"message {num}", {"action": {"DataType": "String", "StringValue": "comment.deleted"}}, "json")
+    return outbox
+
+
+def test_publishes_in_batches_of_ten(sns_stub: Stubber) -> None:
+    # given
+    outbox = outbox_with(sns_stub, 23)
+    for size in (10, 10, 3):
+        expect_batch(sns_stub, size)
+
+    # when
+    sent = outbox.flush()
+
+    # then
+    assert sent == 23
+    assert outbox.stats() == {"sent": 23, "retried": 0, "failed": 0, "pending": 0}
+    assert outbox.flush() == 0
+
+
+def test_retries_entries_sns_failed_on(sns_stub: Stubber) -> None:
+    # given
+    outbox = outbox_with(sns_stub, 3)
+    ids = [entry["Id"] for entry in outbox._pending]
+    expect_batch(
+        sns_stub,
+        3,
+        failed=[
+            {"Id": ids[0], "Code": "InternalError", "SenderFault": False},
+            {"Id": ids[1], "Code": "InvalidParameter", "SenderFault": True},
+        ],
+    )
+    expect_batch(sns_stub, 1)
+
+    # when
+    sent = outbox.flush()
+
+    # then
+    assert sent == 2
+    assert outbox.stats() == {"sent": 2, "retried": 1, "failed": 1, "pending": 0}
+
+
+def test_gives_up_after_max_attempts(sns_stub: Stubber) -> None:
+    # given
+    outbox = outbox_with(sns_stub, 2)
+    for _ in range(3):
+        sns_stub.add_client_error("publish_batch", "Throttled", http_status_code=400)
+
+    # when
+    sent = outbox.flush()
+
+    # then
+    assert sent == 0
+    assert outbox.stats() == {"sent": 0, "retried": 4, "failed": 2, "pending": 0}
+
+
+def test_serverless_flushes_outbox(sns_stub: Stubber) -> None:
+    # given
+    outbox = outbox_with(sns_stub, 0)
+
+    @serverless
+    def handler(event: Dict, context: Any) -> Dict:
+        outbox.add("deleted")
+        return {"statusCode": 204, "body": ""}
+
+    expect_batch(sns_stub, 1)
+
+    # when
+    response = handler({}, None)
+
+    # then
+    assert response["statusCode"] == 204
+    assert outbox.stats() == {"sent": 1, "retried": 0, "failed": 0, "pending": 0}
@@ -1,11 +1,18 @@
 import json
 import uuid
 from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 from typing import Dict
 
+import boto3
 import pytest
 
+from kaizen_blog_api.common import to_feed_item
 from kaizen_blog_api.controller import create_post, like_comment, list_posts, read_post, update_image
+from kaizen_blog_api.post.entities import Post
+from kaizen_blog_api.post.images import variant_names
 from kaizen_blog_api.post.service import PostService
 
 
@@ -112,6 +119,7 @@ class TestPost:
         body = json.loads(response["body"])
         assert "image" in body
         assert body["image"]["id"] == body["id"]
+        assert set(body["image"]["variants"]) == set(variant_names())
 
     @pytest.mark.usefixtures("dynamodb_tables_fixture")
     @pytest.mark.parametrize(
@@ -134,3 +142,162 @@ class TestPost:
         body = json.loads(response["body"])
         assert body["likes"] == 1
         assert response["statusCode"] == 200
+
+    @pytest.mark.usefixtures("many_dummy_posts")
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_list_posts_paginated(self, post_service: PostService) -> None:
+        # given
+        ids = set()
+        event: Dict = {"queryStringParameters": {"limit": "10"}}
+
+        # when
+        while True:
+            response = list_posts(event, None, post_service)
+            assert response["statusCode"] == 200
+            body = json.loads(response["body"])
+            assert len(body) <= 10
+            ids.update(post["id"] for post in body)
+            cursor = response["headers"].get("X-Next-Cursor")
+            if not cursor:
+                break
+            event = {"queryStringParameters": {"limit": "10", "cursor": cursor}}
+
+        # then
+        assert len(ids) == 25
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    @pytest.mark.parametrize("params", [{"limit": "0"}, {"limit": "1000"}, {"cursor": "not a cursor"}])
+    def test_list_posts_bad_pagination(self, params: Dict, post_service: PostService) -> None:
+        # when
+        response = list_posts({"queryStringParameters": params}, None, post_service)
+
+        # then
+        assert response["statusCode"] == 422
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_list_posts_across_buckets(self, post_service: PostService) -> None:
+        # given
+        table = boto3.resource("dynamodb", region_name="eu-west-1").Table("posts")
+        now = datetime.utcnow()
+        for days in (0, 40, 75, 400):
+            post = Post(id=uuid.uuid4(), text="old post", username="user test", created_at=now - timedelta(days=days))
+            table.put_item(Item=to_feed_item(post))
+
+        # when
+        first = list_posts({"queryStringParameters": {"limit": "3"}}, None, post_service)
+        cursor = first["headers"]["X-Next-Cursor"]
+        second = list_posts({"queryStringParameters": {"cursor": cursor}}, None, post_service)
+
+        # then
+        dates = [post["created_at"] for post in json.loads(first["body"]) + json.loads(second["body"])]
+        assert len(dates) == 4
+        assert dates == sorted(dates, reverse=True)
+        assert "X-Next-Cursor" not in second["headers"]
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_like_missing_post(self, post_service: PostService) -> None:
+        # when
+        response = like_comment({"pathParameters": {"id": str(uuid.uuid4())}}, None, post_service)
+
+        # then
+        assert response["statusCode"] == 404
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    @pytest.mark.parametrize(
+        "body",
+        [{"text": "blog text", "username": "user test"}],
+    )
+    def test_concurrent_likes(self, body: Dict, post_service: PostService) -> None:
+        # given
+        result = create_post({"body": json.dumps(body)}, None, post_service)
+        event = {"pathParameters": {"id": json.loads(result["body"])["id"]}}
+
+        # when
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(lambda _: like_comment(event, None, post_service), range(40)))
+
+        # then
+        assert all(response["statusCode"] == 200 for response in responses)
+        assert sorted(json.loads(response["body"])["likes"] for response in responses) == list(range(1, 41))
+        assert json.loads(read_post(event, None, post_service)["body"])["likes"] == 40
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_upload_image_missing_post(self, image_bytes: bytes, post_service: PostService) -> None:
+        # when
+        response = update_image(
+            {
+                "pathParameters": {"id": str(uuid.uuid4())},
+                "body": b64encode(image_bytes),
+                "isBase64Encoded": True,
+            },
+            {},
+            post_service,
+        )
+
+        # then
+        assert response["statusCode"] == 404
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    @pytest.mark.parametrize(
+        "body",
+        [{"text": "blog text", "username": "user test"}],
+    )
+    def test_read_post_sparse_fields(self, body: Dict, post_service: PostService) -> None:
+        # given
+        result = create_post({"body": json.dumps(body)}, None, post_service)
+        post_id = json.loads(result["body"])["id"]
+
+        # when
+        event = {"pathParameters": {"id": post_id}, "queryStringParameters": {"fields": "id,username,image"}}
+        response = read_post(event, None, post_service)
+
+        # then
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == {"id": post_id, "username": "user test", "image": None}
+
+    @pytest.mark.usefixtures("many_dummy_posts")
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_list_posts_sparse_fields(self, post_service: PostService) -> None:
+        # when
+        event = {"queryStringParameters": {"fields": "id,created_at,likes", "limit": "5"}}
+        response = list_posts(event, None, post_service)
+
+        # then
+        body = json.loads(response["body"])
+        assert len(body) == 5
+        assert all(set(post) == {"id", "created_at", "likes"} for post in body)
+        assert body[0]["created_at"] > body[-1]["created_at"]
+
+    @pytest.mark.parametrize("fields", ["id,password", "secret"])
+    def test_list_posts_unknown_fields(self, fields: str, post_service: PostService) -> None:
+        # when
+        response = list_posts({"queryStringParameters": {"fields": fields}}, None, post_service)
+
+        # then
+        assert response["statusCode"] == 422
+
+    @pytest.mark.usefixtures("dynamodb_tables_fixture")
+    def test_read_post_conditional(self, post_service: PostService) -> None:
+        # given
+        result = create_post({"body": json.dumps({"text": "blog text", "username": "user test"})}, None, post_service)
+        path = {"id": json.loads(result["body"])["id"]}
+        first = read_post({"httpMethod": "GET", "pathParameters": path}, None, post_service)
+        etag = first["headers"]["ETag"]
+
+        # when
+        unchanged = read_post(
+            {"httpMethod": "GET", "pathParameters": path, "headers": {"if-none-match": etag}}, None, post_service
+        )
+        like_comment({"pathParameters": path}, None, post_service)
+        changed = read_post(
+            {"httpMethod": "GET", "pathParameters": path, "headers": {"If-None-Match": etag}}, None, post_service
+        )
+
+        # then
+        assert "Last-Modified" in first["headers"]
+        assert unchanged["statusCode"] == 304
+        assert unchanged["body"] == ""
+        assert changed["statusCode"] == 200
+        assert changed["headers"]["ETag"] != etag
+        modified = [parsedate_to_datetime(response["headers"]["Last-Modified"]) for response in (first, changed)]
+        assert modified[1] >= modified[0]
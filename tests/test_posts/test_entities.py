@@ -62,3 +62,17 @@ def test_serialize_without_image(dummy_post: Post) -> None:
     # then
     assert isinstance(post["id"], str)
     assert isinstance(post["likes"], int)
+
+
+def test_tracks_dirty_fields(dummy_post: Post) -> None:
+    # given
+    assert not dummy_post.dirty_fields
+
+    # when
+    dummy_post.likes = 3
+    dummy_post.image = None
+
+    # then
+    assert dummy_post.dirty_fields == {"likes", "image"}
+    dummy_post.mark_clean()
+    assert not dummy_post.dirty_fields
@@ -0,0 +1,227 @@
+import uuid
+from datetime import datetime
+from typing import Any, List, Optional
+
+import pytest
+
+from kaizen_blog_api.post.entities import Post
+from kaizen_blog_api.post.repository import FEED_SNAPSHOT_ID, PostRepository
+from kaizen_blog_api.post.service import CreatePostRequest, LikePostRequest, ListPostsRequest, PostService
+
+
+def create_posts(service: PostService, count: int) -> List[Post]:
+    return [service.create(CreatePostRequest(text=f"Post number {num}", username="user test")) for num in range(count)]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_snapshot_is_not_used_before_rebuild(snapshot_post_service: PostService) -> None:
+    # given
+    create_posts(snapshot_post_service, 2)
+
+    # then
+    assert snapshot_post_service._repository.get_feed_snapshot(5) is None
+    assert len(snapshot_post_service.list_reversed(ListPostsRequest(limit=5)).items) == 2
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_snapshot_is_kept_up_to_date(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    posts = create_posts(service, 3)
+    assert service.rebuild_feed_snapshot() == 3
+
+    # when
+    newest = create_posts(service, 1)[0]
+    page = service._repository.get_feed_snapshot(5)
+
+    # then
+    assert [post.id for post in page.items] == [newest.id] + [post.id for post in reversed(posts)]
+    assert page.cursor is None
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_likes_reach_the_snapshot(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    older, newer = create_posts(service, 2)
+    service.rebuild_feed_snapshot()
+    version = service._repository.table.get_item(Key={"id": FEED_SNAPSHOT_ID})["Item"]["version"]
+
+    # when
+    for _ in range(2):
+        service.like(LikePostRequest(id=older.id))
+    page = service._repository.get_feed_snapshot(5)
+
+    # then
+    assert [(post.id, post.likes) for post in page.items] == [(newer.id, 0), (older.id, 2)]
+    assert service._repository.table.get_item(Key={"id": FEED_SNAPSHOT_ID})["Item"]["version"] == version + 2
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_likes_of_unlisted_posts_leave_the_snapshot_alone(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    create_posts(service, 1)
+    service.rebuild_feed_snapshot()
+    unlisted = Post(id=uuid.uuid4(), text="old post", username="user test", created_at=datetime(2020, 1, 1))
+    service._repository.insert(unlisted)
+    snapshot = service._repository.table.get_item(Key={"id": FEED_SNAPSHOT_ID})["Item"]
+
+    # when
+    service.like(LikePostRequest(id=unlisted.id))
+
+    # then
+    assert service._repository.table.get_item(Key={"id": FEED_SNAPSHOT_ID})["Item"] == snapshot
+
+
+class RacingTable:
+    """Posts table where another writer bumps the snapshot version right before every snapshot write"""
+
+    def __init__(self, table: Any) -> None:
+        self._table = table
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._table, name)
+
+    def put_item(self, **kwargs: Any) -> Any:
+        if kwargs["Item"]["id"] == FEED_SNAPSHOT_ID:
+            self._table.update_item(
+                Key={"id": FEED_SNAPSHOT_ID},
+                UpdateExpression="ADD #version :one",
+                ExpressionAttributeNames={"#version": "version"},
+                ExpressionAttributeValues={":one": 1},
+            )
+        return self._table.put_item(**kwargs)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_snapshot_survives_write_contention(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    posts = create_posts(service, 2)
+    service.rebuild_feed_snapshot()
+    repository = service._repository
+    racing = PostRepository(RacingTable(repository.table), "testing", repository._s3_client, feed_snapshot_size=5)
+
+    # when
+    newest = Post(id=uuid.uuid4(), text="lost the race", username="user test")
+    racing.insert(newest)
+    racing.update_feed_snapshot(newest)
+
+    # then
+    assert [post.id for post in repository.get_feed_snapshot(5).items] == [post.id for post in reversed(posts)]
+
+
+class ShiftingTable(RacingTable):
+    """Posts table where a new post lands at the top of the snapshot right before the first like is written"""
+
+    def __init__(self, table: Any, repository: PostRepository, newest: Post) -> None:
+        super().__init__(table)
+        self._repository = repository
+        self._newest: Optional[Post] = newest
+
+    def update_item(self, **kwargs: Any) -> Any:
+        if kwargs["Key"]["id"] == FEED_SNAPSHOT_ID and self._newest:
+            self._repository.update_feed_snapshot(self._newest)
+            self._newest = None
+        return self._table.update_item(**kwargs)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_snapshot_like_follows_a_moved_post(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    post = create_posts(service, 1)[0]
+    service.rebuild_feed_snapshot()
+    repository = service._repository
+    newest = Post(id=uuid.uuid4(), text="newest", username="user test")
+    repository.insert(newest)
+    table = ShiftingTable(repository.table, repository, newest)
+    racing = PostRepository(table, "testing", repository._s3_client, feed_snapshot_size=5)
+
+    # when
+    racing.like_in_feed_snapshot(post.id)
+
+    # then
+    assert [(listed.id, listed.likes) for listed in repository.get_feed_snapshot(5).items] == [
+        (newest.id, 0),
+        (post.id, 1),
+    ]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_snapshot_keeps_only_the_newest_posts(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    service.rebuild_feed_snapshot()
+    posts = create_posts(service, 7)
+
+    # when
+    snapshot = service._repository.table.get_item(Key={"id": FEED_SNAPSHOT_ID})["Item"]
+
+    # then
+    assert [item["id"] for item in snapshot["posts"]] == [str(post.id) for post in reversed(posts[2:])]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_snapshot_ignores_older_posts(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    create_posts(service, 5)
+    service.rebuild_feed_snapshot()
+    old_post = Post(id=uuid.uuid4(), text="old post", username="user test", created_at=datetime(2021, 6, 1))
+
+    # when
+    service._repository.insert(old_post)
+    service._repository.update_feed_snapshot(old_post)
+
+    # then
+    assert old_post.id not in [post.id for post in service._repository.get_feed_snapshot(5).items]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_first_page_is_served_from_snapshot(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    create_posts(service, 2)
+    service.rebuild_feed_snapshot()
+
+    # when
+    service._repository.insert(Post(id=uuid.uuid4(), text="not in the snapshot", username="user test"))
+    page = service.list_reversed(ListPostsRequest(limit=5))
+
+    # then
+    assert len(page.items) == 2
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_list_continues_from_snapshot_into_the_index(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    posts = create_posts(service, 8)
+    service.rebuild_feed_snapshot()
+
+    # when
+    first = service.list_reversed(ListPostsRequest(limit=3))
+    second = service.list_reversed(ListPostsRequest(limit=3, cursor=first.cursor))
+    third = service.list_reversed(ListPostsRequest(limit=3, cursor=second.cursor))
+
+    # then
+    listed = [post.id for page in (first, second, third) for post in page.items]
+    assert listed == [post.id for post in reversed(posts)]
+    assert len(set(listed)) == len(listed)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_sparse_list_from_snapshot(snapshot_post_service: PostService) -> None:
+    # given
+    service = snapshot_post_service
+    create_posts(service, 2)
+    service.rebuild_feed_snapshot()
+
+    # when
+    page = service.list_reversed(ListPostsRequest(limit=2, fields=["id", "likes"]))
+
+    # then
+    assert all(set(post.values) == {"id", "likes"} for post in page.items)
+    assert all(isinstance(post.values["id"], uuid.UUID) for post in page.items)
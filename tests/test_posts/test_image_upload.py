@@ -0,0 +1,142 @@
+import base64
+import hashlib
+import json
+import uuid
+from typing import Any
+
+import boto3
+import pytest
+from botocore.config import Config
+from moto import mock_s3
+
+from kaizen_blog_api import IMAGE_UPLOAD_MAX_SIZE
+from kaizen_blog_api.controller import create_image_upload, image_uploaded, read_post
+from kaizen_blog_api.post.entities import Post
+from kaizen_blog_api.post.repository import IMAGE_CACHE_CONTROL, PostRepository
+from kaizen_blog_api.post.service import PostService
+from tests.conftest import make_image
+
+
+@pytest.fixture()
+def s3_post_service(post_service: PostService) -> Any:
+    with mock_s3():
+        # moto 2 stores aws-chunked bodies as they are, so only send checksums when S3 requires them
+        config = Config(request_checksum_calculation="when_required")
+        s3_client = boto3.client("s3", region_name="us-east-1", config=config)
+        s3_client.create_bucket(Bucket="testing")
+        yield PostService(PostRepository(post_service._repository.table, "testing", s3_client))
+
+
+def s3_event(key: str) -> dict:
+    return {"Records": [{"s3": {"bucket": {"name": "testing"}, "object": {"key": key}}}]}
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_create_image_upload(dummy_post: Post, s3_post_service: PostService) -> None:
+    # given
+    s3_post_service._repository.insert(dummy_post)
+    event = {"pathParameters": {"id": str(dummy_post.id)}, "body": json.dumps({"content_type": "image/png"})}
+
+    # when
+    response = create_image_upload(event, None, s3_post_service)
+
+    # then
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert body["fields"]["key"] == f"posts/{dummy_post.id}"
+    assert body["fields"]["Content-Type"] == "image/png"
+    policy = json.loads(base64.b64decode(body["fields"]["policy"]))
+    assert ["content-length-range", 1, IMAGE_UPLOAD_MAX_SIZE] in policy["conditions"]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+@pytest.mark.parametrize(
+    "post_exists, content_type, status_code",
+    [(True, "text/html", 422), (False, "image/png", 404)],
+)
+def test_create_image_upload_fails(
+    post_exists: bool, content_type: str, status_code: int, dummy_post: Post, s3_post_service: PostService
+) -> None:
+    # given
+    if post_exists:
+        s3_post_service._repository.insert(dummy_post)
+    event = {"pathParameters": {"id": str(dummy_post.id)}, "body": json.dumps({"content_type": content_type})}
+
+    # when
+    response = create_image_upload(event, None, s3_post_service)
+
+    # then
+    assert response["statusCode"] == status_code
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_uploaded_image_is_attached(dummy_post: Post, image_bytes: bytes, s3_post_service: PostService) -> None:
+    # given
+    dummy_post.image = None
+    s3_post_service._repository.insert(dummy_post)
+    s3 = s3_post_service._repository._s3_client
+    s3.put_object(Bucket="testing", Key=f"posts/{dummy_post.id}", Body=image_bytes)
+
+    # when
+    image_uploaded(s3_event(f"posts/{dummy_post.id}"), None, s3_post_service)
+
+    # then
+    body = json.loads(read_post({"pathParameters": {"id": str(dummy_post.id)}}, None, s3_post_service)["body"])
+    assert body["image"]["id"] == str(dummy_post.id)
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    assert body["image"]["url"].endswith(f"images/{digest}.gif")
+    assert body["image"]["variants"]["thumbnail.webp"].endswith(f"images/{digest}/thumbnail.webp")
+    assert s3.list_objects_v2(Bucket="testing", Prefix=f"images/{digest}/")["KeyCount"] == 6
+    assert s3.list_objects_v2(Bucket="testing", Prefix="posts/")["KeyCount"] == 0
+    stored = s3.head_object(Bucket="testing", Key=f"images/{digest}.gif")
+    assert (stored["ContentType"], stored["CacheControl"]) == ("image/gif", IMAGE_CACHE_CONTROL)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_invalid_upload_is_deleted(dummy_post: Post, s3_post_service: PostService) -> None:
+    # given
+    s3_post_service._repository.insert(dummy_post)
+    s3 = s3_post_service._repository._s3_client
+    s3.put_object(Bucket="testing", Key=f"posts/{dummy_post.id}", Body=b"<html>not an image</html>")
+
+    # when
+    image_uploaded(s3_event(f"posts/{dummy_post.id}"), None, s3_post_service)
+    image_uploaded(s3_event(f"other/{uuid.uuid4()}"), None, s3_post_service)
+
+    # then
+    assert s3.list_objects_v2(Bucket="testing")["KeyCount"] == 0
+    assert s3_post_service._repository.get(dummy_post.id).image == dummy_post.image
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_upload_with_large_header_is_inspected(s3_post_service: PostService) -> None:
+    # given
+    image = make_image("JPEG", icc_profile=b"\x00" * 200_000)
+    key = uuid.uuid4()
+    s3_post_service._repository._s3_client.put_object(Bucket="testing", Key=f"posts/{key}", Body=image)
+
+    # when
+    info = s3_post_service._repository.inspect_upload(key)
+
+    # then
+    assert (info.format, info.width, info.height) == ("JPEG", 321, 123)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_repeated_upload_is_deduplicated(image_bytes: bytes, s3_post_service: PostService) -> None:
+    # given
+    repository = s3_post_service._repository
+    s3 = repository._s3_client
+    first = repository.upload(image_bytes, uuid.uuid4())
+    s3.put_object(Bucket="testing", Key=first.url.split(".com/", 1)[1], Body=b"kept")
+
+    # when
+    second = repository.upload(image_bytes, uuid.uuid4())
+    s3.put_object(Bucket="testing", Key=f"posts/{second.id}", Body=image_bytes)
+    third = repository.store_upload(second.id, repository.inspect_upload(second.id))
+
+    # then
+    assert first.url == second.url == third.url
+    assert first.variants == second.variants == third.variants
+    assert s3.get_object(Bucket="testing", Key=first.url.split(".com/", 1)[1])["Body"].read() == b"kept"
+    assert s3.list_objects_v2(Bucket="testing")["KeyCount"] == 7
@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+from PIL import Image as ImageProcess
+
+from kaizen_blog_api.post.images import VARIANT_WIDTHS, render_variant, render_variants, variant_names
+from tests.conftest import make_image
+
+
+@pytest.mark.parametrize(
+    "image_format, mode, own_format",
+    [("JPEG", "RGB", "JPEG"), ("PNG", "RGBA", "PNG"), ("GIF", "P", "PNG"), ("WEBP", "RGB", "PNG")],
+)
+def test_render_variant(image_format: str, mode: str, own_format: str) -> None:
+    # when
+    own, webp = render_variant(make_image(image_format, mode, (2000, 1500)), "feed", 640)
+
+    # then
+    assert (own.name, webp.name) == ("feed", "feed.webp")
+    assert ImageProcess.open(BytesIO(own.data)).format == own_format
+    assert ImageProcess.open(BytesIO(webp.data)).format == "WEBP"
+    assert ImageProcess.open(BytesIO(own.data)).size == (640, 480)
+
+
+def test_small_images_are_not_enlarged() -> None:
+    # when
+    own, _ = render_variant(make_image("PNG", "RGB", (100, 50)), "full", 1600)
+
+    # then
+    assert ImageProcess.open(BytesIO(own.data)).size == (100, 50)
+
+
+def test_render_variants() -> None:
+    # when
+    with ThreadPoolExecutor() as executor:
+        derivatives = render_variants(make_image("JPEG", "RGB", (2000, 1500)), executor)
+
+    # then
+    assert [derivative.name for derivative in derivatives] == variant_names()
+    widths = {d.name: ImageProcess.open(BytesIO(d.data)).width for d in derivatives if "." not in d.name}
+    assert widths == VARIANT_WIDTHS
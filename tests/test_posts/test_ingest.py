@@ -0,0 +1,118 @@
+import base64
+import struct
+import zlib
+
+import pytest
+from PIL import Image as ImageProcess
+
+from kaizen_blog_api import IMAGE_UPLOAD_MAX_SIZE
+from kaizen_blog_api.errors import ImageError, TruncatedImageError
+from kaizen_blog_api.post.ingest import ViewReader, check_image, decode_image, sniff
+from tests.conftest import make_image
+
+
+def png_header(width: int, height: int) -> bytes:
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + struct.pack(">I", zlib.crc32(ihdr))
+
+
+@pytest.mark.parametrize(
+    "image, image_format",
+    [
+        (make_image("JPEG"), "JPEG"),
+        (make_image("JPEG", exif=b"Exif\x00\x00" + b"\x00" * 4000), "JPEG"),
+        (make_image("PNG"), "PNG"),
+        (make_image("GIF", "P"), "GIF"),
+        (make_image("WEBP"), "WEBP"),
+        (make_image("WEBP", lossless=True), "WEBP"),
+        (make_image("WEBP", "RGBA"), "WEBP"),
+    ],
+)
+def test_sniff(image: bytes, image_format: str) -> None:
+    # when
+    info = sniff(image[:8192])
+
+    # then
+    assert (info.format, info.width, info.height) == (image_format, 321, 123)
+
+
+def test_check_image_reads_past_large_segments() -> None:
+    # given
+    image = make_image("JPEG", icc_profile=b"\x00" * 200_000)
+
+    # when
+    info = check_image(image, len(image))
+
+    # then
+    assert (info.format, info.width, info.height) == ("JPEG", 321, 123)
+    with pytest.raises(TruncatedImageError):
+        sniff(image[:65536])
+
+
+@pytest.mark.parametrize("header", [b"", b"<html></html>", b"\xff\xd8\xff", make_image("BMP")])
+def test_sniff_fails(header: bytes) -> None:
+    # then
+    with pytest.raises(ImageError):
+        sniff(header)
+
+
+@pytest.mark.parametrize(
+    "header, size",
+    [(png_header(100_000, 100_000), 1000), (png_header(0, 10), 1000), (png_header(10, 10), IMAGE_UPLOAD_MAX_SIZE + 1)],
+)
+def test_check_image_rejects(header: bytes, size: int) -> None:
+    # then
+    with pytest.raises(ImageError):
+        check_image(header, size)
+
+
+@pytest.mark.parametrize("is_base64_encoded", [True, False])
+def test_decode_image(is_base64_encoded: bool) -> None:
+    # given
+    image = make_image("PNG")
+    encoded = base64.b64encode(image)
+    body = encoded if is_base64_encoded else "data:image/png;base64," + encoded.decode()
+
+    # when
+    view = decode_image(body, is_base64_encoded)
+
+    # then
+    assert isinstance(view, memoryview)
+    assert view == image
+
+
+@pytest.mark.parametrize("is_base64_encoded", [True, False])
+def test_decode_image_with_line_breaks(is_base64_encoded: bool) -> None:
+    # given
+    image = make_image("PNG", icc_profile=b"\x00" * 200_000)
+    encoded = base64.encodebytes(image)
+    body = encoded if is_base64_encoded else "data:image/png;base64," + encoded.decode()
+
+    # when
+    view = decode_image(body, is_base64_encoded)
+
+    # then
+    assert view == image
+
+
+@pytest.mark.parametrize("body, is_base64_encoded", [("no marker", False), ("data:image/png;base64,a", False)])
+def test_decode_image_fails(body: str, is_base64_encoded: bool) -> None:
+    # then
+    with pytest.raises(ImageError):
+        decode_image(body, is_base64_encoded)
+
+
+def test_view_reader() -> None:
+    # given
+    image = make_image("PNG")
+    reader = ViewReader(memoryview(image))
+
+    # when
+    head = reader.read(8)
+    reader.seek(0)
+
+    # then
+    assert head == image[:8]
+    assert reader.read() == image
+    assert reader.read(10) == b""
+    assert ImageProcess.open(ViewReader(memoryview(image))).size == (321, 123)
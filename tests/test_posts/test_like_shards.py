@@ -0,0 +1,101 @@
+import json
+import uuid
+from typing import Dict
+
+import boto3
+import pytest
+
+from kaizen_blog_api.controller import compact_likes, create_post, like_comment, read_post
+from kaizen_blog_api.post.entities import Post
+from kaizen_blog_api.post.service import PostService
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+@pytest.mark.parametrize(
+    "body",
+    [{"text": "blog text", "username": "user test"}],
+)
+def test_sharded_likes(body: Dict, sharded_post_service: PostService) -> None:
+    # given
+    result = create_post({"body": json.dumps(body)}, None, sharded_post_service)
+    post_id = json.loads(result["body"])["id"]
+    event = {"pathParameters": {"id": post_id}}
+    table = boto3.resource("dynamodb", region_name="eu-west-1").Table("posts")
+
+    # when
+    responses = [like_comment(event, None, sharded_post_service) for _ in range(30)]
+
+    # then
+    assert all(response["statusCode"] == 200 for response in responses)
+    assert json.loads(read_post(event, None, sharded_post_service)["body"])["likes"] == 30
+    assert not table.get_item(Key={"id": post_id})["Item"]["likes"]
+
+    # when
+    compact_likes({}, None, sharded_post_service)
+
+    # then
+    assert table.get_item(Key={"id": post_id})["Item"]["likes"] == 30
+    assert json.loads(read_post(event, None, sharded_post_service)["body"])["likes"] == 30
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_sharded_like_missing_post(sharded_post_service: PostService) -> None:
+    # given
+    post_id = str(uuid.uuid4())
+    table = boto3.resource("dynamodb", region_name="eu-west-1").Table("posts")
+
+    # when
+    response = like_comment({"pathParameters": {"id": post_id}}, None, sharded_post_service)
+    compact_likes({}, None, sharded_post_service)
+
+    # then
+    assert response["statusCode"] == 404
+    assert not [item for item in table.scan()["Items"] if item.get("shard_of") == post_id]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_get_many_sums_sharded_likes(dummy_post: Post, sharded_post_service: PostService) -> None:
+    # given
+    repository = sharded_post_service._repository
+    unliked = Post(id=uuid.uuid4(), text="not liked", username="user test")
+    repository.insert(dummy_post)
+    repository.insert(unliked)
+    for _ in range(5):
+        repository.increment_likes(dummy_post.id)
+
+    # when
+    posts = repository.get_many([dummy_post.id, uuid.uuid4(), unliked.id])
+
+    # then
+    assert [(post.id, post.likes) for post in posts] == [(dummy_post.id, 5), (unliked.id, 0)]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_sparse_read_sums_sharded_likes(dummy_post: Post, sharded_post_service: PostService) -> None:
+    # given
+    sharded_post_service._repository.insert(dummy_post)
+    event = {"pathParameters": {"id": str(dummy_post.id)}}
+    for _ in range(7):
+        like_comment(event, None, sharded_post_service)
+
+    # when
+    response = read_post({**event, "queryStringParameters": {"fields": "likes,text"}}, None, sharded_post_service)
+
+    # then
+    assert json.loads(response["body"]) == {"likes": 7, "text": dummy_post.text}
+    assert json.loads(read_post(event, None, sharded_post_service)["body"])["likes"] == 7
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_sharded_like_of_missing_post_writes_nothing(sharded_post_service: PostService) -> None:
+    # given
+    table = sharded_post_service._repository.table
+
+    # when
+    responses = [
+        like_comment({"pathParameters": {"id": str(uuid.uuid4())}}, None, sharded_post_service) for _ in range(5)
+    ]
+
+    # then
+    assert [response["statusCode"] for response in responses] == [404] * 5
+    assert not table.scan()["Items"]
@@ -0,0 +1,235 @@
+import uuid
+from datetime import datetime
+from typing import Any, List
+
+import pytest
+from botocore.exceptions import ClientError
+
+from kaizen_blog_api.cache import RecordCache
+from kaizen_blog_api.common import FEED_OLDEST_ID, feed_bucket
+from kaizen_blog_api.errors import AWSError, ConflictError, RecordNotFound
+from kaizen_blog_api.post.entities import Image, Post
+from kaizen_blog_api.post.repository import PostRepository
+from kaizen_blog_api.post.service import PostService
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_update_writes_only_changed_fields(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    repository = post_service._repository
+    repository.insert(dummy_post)
+    first, second = repository.get(dummy_post.id), repository.get(dummy_post.id)
+
+    # when
+    first.text = "edited text"
+    repository.update(first)
+    second.image = None
+    repository.update(second)
+
+    # then
+    post = repository.get(dummy_post.id)
+    assert post.text == "edited text"
+    assert post.image is None
+    assert post.version == 2
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_update_version_conflict(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    repository = post_service._repository
+    repository.insert(dummy_post)
+    first, second = repository.get(dummy_post.id), repository.get(dummy_post.id)
+
+    # when
+    first.text = "first edit"
+    repository.update(first, check_version=True)
+    second.text = "second edit"
+
+    # then
+    with pytest.raises(ConflictError):
+        repository.update(second, check_version=True)
+    assert repository.get(dummy_post.id).text == "first edit"
+    assert first.version == 1
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_versioned_update_of_deleted_post(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    repository = post_service._repository
+    repository.insert(dummy_post)
+    read = repository.get(dummy_post.id)
+    repository.table.delete_item(Key={"id": str(dummy_post.id)})
+
+    # when
+    read.text = "edited text"
+
+    # then
+    with pytest.raises(RecordNotFound):
+        repository.update(read, check_version=True)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_set_image_conflicts_with_versioned_update(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    repository = post_service._repository
+    repository.insert(dummy_post)
+    read = repository.get(dummy_post.id)
+    image = Image(id=dummy_post.id, url="https://new.url")
+
+    # when
+    repository.set_image(dummy_post.id, image)
+    repository.increment_likes(dummy_post.id)
+    read.text = "edited text"
+
+    # then
+    with pytest.raises(ConflictError):
+        repository.update(read, check_version=True)
+    post = repository.get(dummy_post.id)
+    assert (post.text, post.image, post.likes, post.version) == ("testing", image, 1, 1)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_likes_do_not_conflict_with_versioned_update(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    repository = post_service._repository
+    repository.insert(dummy_post)
+    read = repository.get(dummy_post.id)
+
+    # when
+    repository.increment_likes(dummy_post.id)
+    read.text = "edited text"
+    repository.update(read, check_version=True)
+
+    # then
+    post = repository.get(dummy_post.id)
+    assert (post.text, post.likes, post.version) == ("edited text", 1, 1)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_get_many(post_service: PostService) -> None:
+    # given
+    repository = post_service._repository
+    posts = [Post(id=uuid.uuid4(), text=f"Post number {num}", username="user test") for num in range(3)]
+    for post in posts:
+        repository.insert(post)
+
+    # when
+    result = repository.get_many([posts[2].id, uuid.uuid4(), posts[0].id], consistent_read=True)
+
+    # then
+    assert [post.id for post in result] == [posts[2].id, posts[0].id]
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_sparse_read_uses_cached_post(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    base = post_service._repository
+    repository = PostRepository(base.table, base._bucket_name, base._s3_client, posts_cache=RecordCache("posts", 10))
+    repository.insert(dummy_post)
+    repository.get(dummy_post.id)
+    base.table.delete_item(Key={"id": str(dummy_post.id)})
+
+    # when
+    sparse = repository.get_sparse(dummy_post.id, ["id", "text"])
+
+    # then
+    assert sparse.values == {"id": dummy_post.id, "text": dummy_post.text}
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_cached_get_is_invalidated_by_likes(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    base = post_service._repository
+    repository = PostRepository(base.table, base._bucket_name, base._s3_client, posts_cache=RecordCache("posts", 10))
+    repository.insert(dummy_post)
+    repository.get(dummy_post.id)
+    base.table.update_item(
+        Key={"id": str(dummy_post.id)},
+        UpdateExpression="SET #text = :text",
+        ExpressionAttributeNames={"#text": "text"},
+        ExpressionAttributeValues={":text": "changed elsewhere"},
+    )
+
+    # when
+    cached = repository.get(dummy_post.id)
+    repository.increment_likes(dummy_post.id)
+    reloaded = repository.get(dummy_post.id)
+
+    # then
+    assert cached.text == dummy_post.text
+    assert reloaded.text == "changed elsewhere"
+    assert reloaded.likes == dummy_post.likes + 1
+
+
+class QueryLog:
+    """Posts table recording the feed bucket of every query"""
+
+    def __init__(self, table: Any) -> None:
+        self._table = table
+        self.buckets: List[str] = []
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._table, name)
+
+    def query(self, **kwargs: Any) -> Any:
+        self.buckets.append(kwargs["KeyConditionExpression"].get_expression()["values"][1])
+        return self._table.query(**kwargs)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_feed_walk_stops_at_the_oldest_bucket(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    base = post_service._repository
+    table = QueryLog(base.table)
+    repository = PostRepository(table, base._bucket_name, base._s3_client)
+    repository.insert(dummy_post)
+
+    # when
+    page = repository.list_by_date_reversed(10)
+
+    # then
+    assert [post.id for post in page.items] == [dummy_post.id]
+    assert page.cursor is None
+    assert table.buckets == [feed_bucket(datetime.utcnow())]
+
+
+class FailingMarker(QueryLog):
+    """Posts table that cannot write the oldest feed bucket marker"""
+
+    def update_item(self, **kwargs: Any) -> Any:
+        if kwargs["Key"]["id"] == FEED_OLDEST_ID:
+            raise ClientError({"Error": {"Code": "ProvisionedThroughputExceededException"}}, "UpdateItem")
+        return self._table.update_item(**kwargs)
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_insert_fails_before_writing_when_the_marker_fails(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    base = post_service._repository
+    repository = PostRepository(FailingMarker(base.table), base._bucket_name, base._s3_client)
+
+    # when
+    with pytest.raises(AWSError):
+        repository.insert(dummy_post)
+
+    # then
+    assert "Item" not in base.table.get_item(Key={"id": str(dummy_post.id)})
+
+
+@pytest.mark.usefixtures("dynamodb_tables_fixture")
+def test_feed_walk_reaches_older_posts(dummy_post: Post, post_service: PostService) -> None:
+    # given
+    base = post_service._repository
+    table = QueryLog(base.table)
+    repository = PostRepository(table, base._bucket_name, base._s3_client)
+    old_post = Post(id=uuid.uuid4(), text="old post", username="user test", created_at=datetime(2022, 3, 1))
+    repository.insert(dummy_post)
+    repository.insert(old_post)
+
+    # when
+    page = repository.list_by_date_reversed(10)
+
+    # then
+    assert [post.id for post in page.items] == [dummy_post.id, old_post.id]
+    assert table.buckets[-1] == "2022-03"
+    assert page.cursor is None
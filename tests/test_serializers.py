@@ -0,0 +1,59 @@
+import json
+from dataclasses import asdict
+
+import pytest
+
+from kaizen_blog_api.comment.entities import Comment
+from kaizen_blog_api.post.entities import Post
+from kaizen_blog_api.serializers import (
+    JSONBackend,
+    JSONEncoder,
+    OrjsonBackend,
+    SerializerRegistry,
+    dict_factory,
+    orjson,
+    to_item,
+)
+
+BACKENDS = [JSONBackend(), pytest.param(OrjsonBackend(), marks=pytest.mark.skipif(orjson is None, reason="orjson"))]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_dumps_matches_asdict(backend: JSONBackend, dummy_post: Post) -> None:
+    # given
+    registry = SerializerRegistry(backend)
+
+    # when
+    body = registry.dumps(dummy_post)
+
+    # then
+    assert json.loads(body) == json.loads(json.dumps(asdict(dummy_post), cls=JSONEncoder))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_dumps_many(backend: JSONBackend, dummy_post: Post, dummy_comment: Comment) -> None:
+    # given
+    registry = SerializerRegistry(backend)
+    dummy_post.image = None
+
+    # when
+    body = json.loads(registry.dumps_many([dummy_post, dummy_comment]))
+
+    # then
+    assert body[0]["image"] is None
+    assert body[1]["post_id"] == str(dummy_comment.post_id)
+    assert body[1]["created_at"] == dummy_comment.created_at.isoformat()
+
+
+def test_to_item_matches_dict_factory(dummy_post: Post, dummy_comment: Comment) -> None:
+    # then
+    assert to_item(dummy_post) == asdict(dummy_post, dict_factory=dict_factory)
+    assert to_item(dummy_comment) == asdict(dummy_comment, dict_factory=dict_factory)
+
+
+def test_to_item_skips_none(dummy_post: Post) -> None:
+    # given
+    dummy_post.image = None
+
+    # then
+    assert "image" not in to_item(dummy_post)
@@ -0,0 +1,100 @@
+import base64
+import gzip
+
+import pytest
+
+from kaizen_blog_api.serverless import serverless
+
+
+@serverless
+def handler(event: dict, context: object) -> dict:
+    return {"statusCode": 200, "body": '{"text": "blog text"}'}
+
+
+def test_etag_is_added() -> None:
+    # when
+    response = handler({"httpMethod": "GET"}, None)
+
+    # then
+    assert response["statusCode"] == 200
+    assert response["headers"]["ETag"].startswith('"')
+
+
+@pytest.mark.parametrize("if_none_match", ["*", '"other", {etag}', "W/{etag}"])
+def test_not_modified(if_none_match: str) -> None:
+    # given
+    etag = handler({"httpMethod": "GET"}, None)["headers"]["ETag"]
+
+    # when
+    response = handler({"httpMethod": "GET", "headers": {"If-None-Match": if_none_match.format(etag=etag)}}, None)
+
+    # then
+    assert response["statusCode"] == 304
+
+
+@pytest.mark.parametrize("method", ["POST", "DELETE"])
+def test_writes_are_not_conditional(method: str) -> None:
+    # when
+    response = handler({"httpMethod": method, "headers": {"If-None-Match": "*"}}, None)
+
+    # then
+    assert response["statusCode"] == 200
+    assert "ETag" not in response["headers"]
+
+
+def test_events_without_a_method_are_not_conditional() -> None:
+    # when
+    response = handler({"headers": {"If-None-Match": "*"}}, None)
+
+    # then
+    assert response["statusCode"] == 200
+    assert "ETag" not in response["headers"]
+
+
+@serverless
+def big_handler(event: dict, context: object) -> dict:
+    return {"statusCode": 200, "body": '{"text": "blog text"}' * 100}
+
+
+def test_response_is_compressed() -> None:
+    # when
+    response = big_handler({"httpMethod": "GET", "headers": {"Accept-Encoding": "gzip"}}, None)
+
+    # then
+    assert response["isBase64Encoded"] is True
+    assert response["headers"]["Content-Encoding"] == "gzip"
+    assert response["headers"]["ETag"].endswith('-gzip"')
+    assert gzip.decompress(base64.b64decode(response["body"])).decode() == '{"text": "blog text"}' * 100
+
+
+def test_small_responses_are_not_compressed() -> None:
+    # when
+    response = handler({"httpMethod": "GET", "headers": {"Accept-Encoding": "gzip"}}, None)
+
+    # then
+    assert "isBase64Encoded" not in response
+    assert "Content-Encoding" not in response["headers"]
+    assert response["headers"]["Vary"] == "Accept-Encoding"
+
+
+def test_uncompressed_responses_vary_on_encoding() -> None:
+    # when
+    response = big_handler({"httpMethod": "GET"}, None)
+
+    # then
+    assert "Content-Encoding" not in response["headers"]
+    assert response["headers"]["Vary"] == "Accept-Encoding"
+
+
+def test_not_modified_compressed_response() -> None:
+    # given
+    event = {"httpMethod": "GET", "headers": {"Accept-Encoding": "gzip"}}
+    etag = big_handler(event, None)["headers"]["ETag"]
+
+    # when
+    response = big_handler({**event, "headers": {**event["headers"], "If-None-Match": etag}}, None)
+
+    # then
+    assert response["statusCode"] == 304
+    assert response["body"] == ""
+    assert response["headers"]["Vary"] == "Accept-Encoding"
@@ -0,0 +1,39 @@
+import uuid
+from dataclasses import asdict
+
+import pytest
+
+from kaizen_blog_api.errors import ValidationError
+from kaizen_blog_api.post.entities import Post
+from kaizen_blog_api.serializers import dict_factory
+from kaizen_blog_api.validators import SchemaRegistry
+
+
+def test_schema_is_compiled_once() -> None:
+    # given
+    registry = SchemaRegistry()
+
+    # then
+    assert registry.get(Post) is registry.get(Post)
+
+
+def test_load_many(dummy_post: Post) -> None:
+    # given
+    registry = SchemaRegistry()
+    items = [asdict(dummy_post, dict_factory=dict_factory) for _ in range(3)]
+
+    # when
+    posts = registry.load_many(items, Post)
+
+    # then
+    assert len(posts) == 3
+    assert all(post.id == dummy_post.id for post in posts)
+
+
+def test_load_fails() -> None:
+    # given
+    registry = SchemaRegistry()
+
+    # then
+    with pytest.raises(ValidationError):
+        registry.load({"id": str(uuid.uuid4()), "username": 3}, Post)